@@ -93,6 +93,40 @@
       bub.innerHTML = String(text).replace(/\n/g, '<br/>');
       div.appendChild(bub);
       msgs.appendChild(div); msgs.scrollTop = msgs.scrollHeight;
+      return bub;
+    }
+
+    // Read a text/event-stream body from /chat and grow one bot bubble as `delta` events arrive
+    async function readChatStream(body){
+      const bub = addMessage('', 'bot');
+      const reader = body.getReader();
+      const decoder = new TextDecoder();
+      let buf = ''; let text = '';
+      const render = ()=>{ bub.innerHTML = String(text).replace(/\n/g, '<br/>'); msgs.scrollTop = msgs.scrollHeight; };
+      while(true){
+        let chunk;
+        // a dropped connection keeps what already streamed and notes the interruption under it
+        try{ chunk = await reader.read(); }
+        catch(e){ text += (text ? '\n' : '') + 'Chat stream interrupted: ' + e.message; render(); return; }
+        const { value, done } = chunk;
+        if(done) break;
+        buf += decoder.decode(value, { stream: true });
+        let sep;
+        while((sep = buf.indexOf('\n\n')) !== -1){
+          const block = buf.slice(0, sep); buf = buf.slice(sep + 2);
+          let event = 'message'; let data = '';
+          block.split('\n').forEach(line => {
+            if(line.indexOf('event:') === 0) event = line.slice(6).trim();
+            else if(line.indexOf('data:') === 0) data += line.slice(5).trim();
+          });
+          let j = null; try{ j = data ? JSON.parse(data) : null; }catch(e){ j = null; }
+          if(!j) continue;
+          if(event === 'delta'){ text += j.delta || ''; render(); }
+          else if(event === 'done'){ if(j.reply) text = j.reply; render(); }
+          else if(event === 'error'){ text += (text ? '\n' : '') + 'Chat server error: ' + (j.error || 'unknown'); render(); }
+        }
+      }
+      if(!text){ text = 'No response from server.'; render(); }
     }
 
   // Keep the toggle button visible at all times; clicking toggles the chat panel.
@@ -115,10 +149,11 @@
         if(window.EduCareAdmin && EduCareAdmin.getStore){ const store = EduCareAdmin.getStore(); if(store && store.meta) context.systemMeta = store.meta; if(store && store.meta && store.meta.chatbotContext) context.project = store.meta.chatbotContext; }
       }catch(e){ /* ignore */ }
 
-      addMessage('Thinking...', 'bot');
+      const thinking = addMessage('Thinking...', 'bot').parentNode;
       try{
         // Do not include client-side API keys. The server will use its server-side stored key.
-        const payload = { messages, context };
+        // Ask for a streamed reply without the provider's raw payload (the widget only shows `reply`)
+        const payload = { messages, context, stream: true, raw: false };
 
         // determine model server base (if configured in system settings) and post there, otherwise use same-origin /chat
         let endpoint = '/chat';
@@ -133,7 +168,9 @@
         // Helper to perform a POST and return {ok,res,bodyText,json}
         async function doPost(url){
           try{
-            const r = await fetch(url, { method:'POST', headers: {'Content-Type':'application/json'}, body: JSON.stringify(payload) });
+            const r = await fetch(url, { method:'POST', headers: {'Content-Type':'application/json', 'Accept':'text/event-stream, application/json'}, body: JSON.stringify(payload) });
+            const ctype = r.headers.get('Content-Type') || '';
+            if(r.ok && r.body && ctype.indexOf('text/event-stream') !== -1){ return { ok: true, status: r.status, stream: r.body }; }
             const text = await r.text().catch(()=>null);
             let json = null;
             try{ json = text ? JSON.parse(text) : null; }catch(e){ json = null; }
@@ -152,8 +189,8 @@
           result = await doPost(alt);
         }
 
-        // remove the last 'Thinking...' bubble
-        const last = msgs.querySelectorAll('.msg.bot'); if(last && last.length) last[last.length-1].remove();
+        // remove the 'Thinking...' bubble
+        thinking.remove();
 
         if(!result){
           addMessage('No response from chat request (unknown error).', 'bot');
@@ -169,13 +206,14 @@
           addMessage(`Chat server error (${result.status}): ${txt}`, 'bot');
           return;
         }
+        if(result.stream){ await readChatStream(result.stream); return; }
         const j = result.json || null;
         if(j && j.reply){ addMessage(j.reply, 'bot'); }
         else if(j && j.raw){ addMessage(JSON.stringify(j.raw).slice(0,800), 'bot'); }
         else addMessage('No response from server.', 'bot');
       }catch(e){
-        // remove thinking
-        const last = msgs.querySelectorAll('.msg.bot'); if(last && last.length) last[last.length-1].remove();
+        // remove thinking (a no-op once a reply bubble replaced it; that bubble stays)
+        thinking.remove();
         addMessage('Failed to contact chat server: '+e.message, 'bot');
       }
     }
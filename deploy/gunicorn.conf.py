@@ -0,0 +1,61 @@
+"""Gunicorn settings for the EduCare API (model.api:app).
+
+Usage: gunicorn -c deploy/gunicorn.conf.py model.api:app
+
+Each worker runs api.warmup() after loading the app and before it accepts
+connections, so the first /predict after a (re)start does not pay for imports,
+unpickling the model or sklearn's first-call overhead.
+
+Workers are threaded (gthread): a /chat waiting on the provider holds one
+request thread, not the whole worker, so /predict keeps being served. Model
+inference runs on a small per-worker CPU pool and provider/Firestore calls on
+an I/O pool (model/executors.py). Set EDUCARE_WORKER_CLASS=sync to go back to
+one request per process.
+
+With EDUCARE_METRICS_DIR set, a worker flushes its metrics snapshot when it
+exits and the master folds it into the retired-workers total, so host-wide
+counters on /metrics keep growing across worker restarts.
+"""
+import os
+import sys
+
+bind = os.environ.get('EDUCARE_BIND') or f"0.0.0.0:{os.environ.get('EDUCARE_PORT', '8000')}"
+workers = int(os.environ.get('EDUCARE_WORKERS', '4'))
+worker_class = os.environ.get('EDUCARE_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('EDUCARE_THREADS', '16'))
+# provider calls can legitimately take up to EDUCARE_CHAT_DEADLINE; with gthread the
+# worker heartbeat is separate from request threads, so this only catches hung workers
+timeout = int(os.environ.get('EDUCARE_WORKER_TIMEOUT', '60'))
+
+
+def post_worker_init(worker):
+    if os.environ.get('EDUCARE_WARMUP', '1').lower() in ('0', 'false', 'no'):
+        return
+    from model import api
+    api.warmup()
+
+
+def on_starting(server):
+    # snapshots left behind by a previous master belong to workers that are gone
+    _retire_metrics(server, None)
+
+
+def worker_exit(server, worker):
+    api = sys.modules.get('model.api')
+    if api is not None and os.environ.get('EDUCARE_METRICS_DIR'):
+        api.METRICS.maybe_flush(force=True)
+
+
+def child_exit(server, worker):
+    _retire_metrics(server, worker.pid)
+
+
+def _retire_metrics(server, pid):
+    directory = os.environ.get('EDUCARE_METRICS_DIR')
+    if not directory:
+        return
+    from model import metrics
+    try:
+        metrics.retire_worker(directory, pid)
+    except OSError as e:
+        server.log.warning('Could not retire metrics snapshot of worker %s: %s', pid, e)
@@ -0,0 +1,303 @@
+"""Per-route admission control shared by all workers on a host.
+
+Each limited route has a number of run slots (how many requests may execute at
+once across every gunicorn worker) and wait slots (how many may queue for a
+run slot). Slots are lock files under a shared directory held with
+`flock(LOCK_EX | LOCK_NB)`: the kernel releases them if a worker dies, so a
+crash can never leak capacity. A request that finds no wait slot is rejected
+at once with 429; one that waits longer than the route's wait budget gets 503.
+Both carry Retry-After.
+
+`/predict` has priority: it is not limited by default, and the limited
+(low-priority) routes together may only use `threads - reserve` request
+threads per process, so every worker keeps threads free for predictions even
+during a chat storm or a burst of /train calls.
+
+Where `fcntl` is unavailable (Windows development) the slots fall back to
+in-process semaphores, which is exact for the single-process dev server.
+
+Slot usage (stats(), /ready, /metrics) is read from /proc/locks, matched
+against the inodes of the slot files, so counting never takes a slot away
+from a request and touches no files. Without /proc/locks (macOS) only the
+slots held by this process are counted, and stats() says `scope: process`.
+
+Configuration (EDUCARE_ADMISSION):
+    /chat=24:48:5,/train=1:2:30,/upload=4:8:10,/predict_file=4:8:10
+    route=<run slots>:<wait slots>:<max wait seconds>; set to 0 to disable.
+"""
+import math
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+DEFAULT_SPEC = '/chat=24:48:5,/train=1:2:30,/upload=4:8:10,/predict_file=4:8:10'
+PRIORITY_ROUTES = frozenset({'/predict'})
+
+
+class Rejected(Exception):
+    def __init__(self, status: int, retry_after: int, reason: str):
+        super().__init__(reason)
+        self.status = status
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+# held() default: read /proc/locks itself (None means it is unavailable)
+_READ_LOCKS = object()
+
+
+def locked_files() -> Optional[Set[Tuple[int, int, int]]]:
+    """(major, minor, inode) of every file with a granted lock on this host; None without /proc/locks."""
+    try:
+        with open('/proc/locks', 'r', encoding='ascii', errors='replace') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return None
+    out = set()
+    for line in lines:
+        parts = line.split()
+        # '1: FLOCK  ADVISORY  WRITE 19451 fe:00:13533399 0 EOF'; blocked waiters have a '->' column
+        if len(parts) < 6 or parts[1] == '->':
+            continue
+        try:
+            major, minor, inode = parts[5].split(':')
+            out.add((int(major, 16), int(minor, 16), int(inode)))
+        except ValueError:
+            continue
+    return out
+
+
+class _FileSlots:
+    """`count` flock-backed slots.
+
+    A held slot owns its descriptor until released, so it can be released from
+    any thread (streamed responses are closed after the view returned) and two
+    requests in one process never share a lock. Idle descriptors are pooled
+    per process to avoid an open() per attempt.
+    """
+
+    def __init__(self, directory: Path, name: str, count: int):
+        self.paths = [str(directory / f'{name}.{i}.lock') for i in range(count)]
+        self._lock = threading.Lock()
+        self._free: List[List[int]] = [[] for _ in self.paths]
+        self._pid = os.getpid()
+        self._next = 0
+        self._held = 0
+        # slot files are created up front so held() can match them in /proc/locks without touching them
+        self._keys = set()
+        for i, path in enumerate(self.paths):
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            st = os.fstat(fd)
+            self._keys.add((os.major(st.st_dev), os.minor(st.st_dev), st.st_ino))
+            self._free[i].append(fd)
+
+    def _take(self, i: int) -> int:
+        with self._lock:
+            if self._pid != os.getpid():
+                # descriptors inherited across fork share lock state with the parent
+                for fds in self._free:
+                    for fd in fds:
+                        try:
+                            os.close(fd)
+                        except OSError:
+                            pass
+                self._free = [[] for _ in self.paths]
+                self._pid = os.getpid()
+            if self._free[i]:
+                return self._free[i].pop()
+        return os.open(self.paths[i], os.O_RDWR | os.O_CREAT, 0o600)
+
+    def _give(self, i: int, fd: int) -> None:
+        with self._lock:
+            self._free[i].append(fd)
+
+    def try_acquire(self) -> Optional[Tuple[int, int]]:
+        n = len(self.paths)
+        start = self._next % n if n else 0
+        self._next += 1  # spread attempts so waiters do not all hammer slot 0
+        for k in range(n):
+            i = (start + k) % n
+            fd = self._take(i)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except (BlockingIOError, PermissionError):
+                self._give(i, fd)
+                continue
+            with self._lock:
+                self._held += 1
+            return i, fd
+        return None
+
+    def release(self, token: Tuple[int, int]) -> None:
+        i, fd = token
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        with self._lock:
+            self._held -= 1
+        self._give(i, fd)
+
+    def held(self, locked=_READ_LOCKS) -> int:
+        """Held slots: host-wide from a locked_files() snapshot (read here if not given), else this process's."""
+        if locked is _READ_LOCKS:
+            locked = locked_files()
+        if locked is None:
+            return self._held
+        return len(self._keys & locked)
+
+
+class _LocalSlots:
+    def __init__(self, count: int):
+        self.count = count
+        self._lock = threading.Lock()
+        self._used = 0
+
+    def try_acquire(self) -> Optional[int]:
+        with self._lock:
+            if self._used >= self.count:
+                return None
+            self._used += 1
+            return 0
+
+    def release(self, _token) -> None:
+        with self._lock:
+            self._used -= 1
+
+    def held(self, _locked=_READ_LOCKS) -> int:
+        return self._used
+
+
+class RouteLimit:
+    def __init__(self, route: str, limit: int, queue: int, wait: float, directory: Optional[Path]):
+        self.route = route
+        self.limit = limit
+        self.queue = queue
+        self.wait = wait
+        name = route.strip('/').replace('/', '_') or 'root'
+        if fcntl is not None and directory is not None:
+            self.run_slots = _FileSlots(directory, name + '.run', limit)
+            self.wait_slots = _FileSlots(directory, name + '.wait', queue)
+        else:
+            self.run_slots = _LocalSlots(limit)
+            self.wait_slots = _LocalSlots(queue)
+        self.poll = 0.002 if route in PRIORITY_ROUTES else 0.01
+        self.rejected = {429: 0, 503: 0}
+        self.admitted = 0
+
+    def retry_after(self) -> int:
+        return max(1, int(math.ceil(self.wait)))
+
+
+class Ticket:
+    __slots__ = ('route', 'slot', 'local', 'released')
+
+    def __init__(self, route: RouteLimit, slot, local: bool):
+        self.route = route
+        self.slot = slot
+        self.local = local
+        self.released = False
+
+
+class AdmissionController:
+    def __init__(self, routes: Dict[str, RouteLimit], local_capacity: int):
+        self.routes = routes
+        # request threads the low-priority routes may use in this process
+        self.local_capacity = max(1, local_capacity)
+        self._local = threading.BoundedSemaphore(self.local_capacity)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'AdmissionController':
+        spec = os.environ.get('EDUCARE_ADMISSION', DEFAULT_SPEC).strip()
+        if spec.lower() in ('0', 'false', 'no', 'off'):
+            spec = ''
+        directory = Path(os.environ.get('EDUCARE_ADMISSION_DIR') or
+                         Path(tempfile.gettempdir()) / f'educare-admission-{os.getuid() if hasattr(os, "getuid") else 0}')
+        if spec and fcntl is not None:
+            directory.mkdir(parents=True, exist_ok=True)
+        routes = {}
+        for part in spec.split(','):
+            route, _, vals = part.strip().partition('=')
+            if not route or not vals:
+                continue
+            nums = (vals.split(':') + ['', ''])[:3]
+            limit = int(nums[0] or 1)
+            queue = int(nums[1] or 0)
+            wait = float(nums[2] or 0)
+            if limit > 0:
+                routes[route] = RouteLimit(route, limit, queue, wait, directory)
+        threads = int(os.environ.get('EDUCARE_THREADS', '16'))
+        reserve = int(os.environ.get('EDUCARE_PREDICT_RESERVE', '4'))
+        return cls(routes, threads - reserve)
+
+    def enabled(self) -> bool:
+        return bool(self.routes)
+
+    def admit(self, route: str) -> Optional[Ticket]:
+        """Block until `route` may run and return a ticket (None for unlimited routes); raise Rejected when full."""
+        rl = self.routes.get(route)
+        if rl is None:
+            return None
+        deadline = time.monotonic() + rl.wait
+        local = route not in PRIORITY_ROUTES
+        if local and not self._local.acquire(timeout=max(0.0, rl.wait)):
+            self._reject(rl, 503, 'server busy')
+        try:
+            slot = rl.run_slots.try_acquire()
+            if slot is None:
+                waiting = rl.wait_slots.try_acquire()
+                if waiting is None:
+                    self._reject(rl, 429, 'too many requests queued')
+                try:
+                    while slot is None:
+                        if time.monotonic() >= deadline:
+                            self._reject(rl, 503, 'timed out waiting for capacity')
+                        time.sleep(rl.poll)
+                        slot = rl.run_slots.try_acquire()
+                finally:
+                    rl.wait_slots.release(waiting)
+        except Exception:
+            if local:
+                self._local.release()
+            raise
+        with self._lock:
+            rl.admitted += 1
+        return Ticket(rl, slot, local)
+
+    def release(self, ticket: Optional[Ticket]) -> None:
+        if ticket is None or ticket.released:
+            return
+        ticket.released = True
+        ticket.route.run_slots.release(ticket.slot)
+        if ticket.local:
+            self._local.release()
+
+    def _reject(self, rl: RouteLimit, status: int, reason: str):
+        with self._lock:
+            rl.rejected[status] += 1
+        raise Rejected(status, rl.retry_after(), reason)
+
+    def stats(self) -> Dict:
+        """Per-route limits, usage and counters; /proc/locks is read once for all routes."""
+        out = {}
+        locked = locked_files() if fcntl is not None else None
+        for route, rl in self.routes.items():
+            file_slots = isinstance(rl.run_slots, _FileSlots)
+            out[route] = {
+                'limit': rl.limit,
+                'queue': rl.queue,
+                'running': rl.run_slots.held(locked),
+                'waiting': rl.wait_slots.held(locked),
+                # 'process': counts cover this worker only (no /proc/locks, or in-process slots)
+                'scope': 'host' if file_slots and locked is not None else 'process',
+                'admitted': rl.admitted,
+                'rejected_429': rl.rejected[429],
+                'rejected_503': rl.rejected[503],
+            }
+        return out
@@ -0,0 +1,169 @@
+"""LRU + TTL response cache for /chat.
+
+Entries are keyed by a hash of the normalized final prompt, the model name and
+the generation parameters, so the same question asked with the same context
+maps to one provider round-trip. The in-process LRU is always used; when a
+directory is configured the cache is also written through to one small JSON file
+per key there, which lets gunicorn workers on the same host share replies.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+_WS_RE = re.compile(r'\s+')
+
+
+def normalize_prompt(prompt: str) -> str:
+    return _WS_RE.sub(' ', prompt or '').strip().casefold()
+
+
+def make_key(prompt: str, model: str, params: Dict) -> str:
+    h = hashlib.sha256()
+    h.update(normalize_prompt(prompt).encode('utf-8'))
+    h.update(b'\0')
+    h.update(str(model).encode('utf-8'))
+    h.update(b'\0')
+    h.update(json.dumps(params or {}, sort_keys=True, default=str).encode('utf-8'))
+    return h.hexdigest()
+
+
+class ChatCache:
+    def __init__(self, max_entries: int = 256, ttl: float = 3600.0, directory: Optional[str] = None):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl)
+        self.directory = Path(directory) if directory else None
+        self._mem: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> 'ChatCache':
+        return cls(
+            max_entries=int(os.environ.get('EDUCARE_CHAT_CACHE_SIZE') or 256),
+            ttl=float(os.environ.get('EDUCARE_CHAT_CACHE_TTL') or 3600),
+            directory=os.environ.get('EDUCARE_CHAT_CACHE_DIR') or None,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f'{key}.json'
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            item = self._mem.get(key)
+            if item is not None:
+                expires, value = item
+                if expires > now:
+                    self._mem.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._mem[key]
+        value = self._disk_get(key, now)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, value, now)
+        return value
+
+    def set(self, key: str, value) -> None:
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            self._writes += 1
+            prune = self.directory is not None and self._writes % 64 == 0
+        if self.directory is not None:
+            self._disk_set(key, value, now + self.ttl)
+            if prune:
+                self._disk_prune(now)
+
+    def _remember(self, key, value, now):
+        self._mem[key] = (now + self.ttl, value)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def _disk_get(self, key, now):
+        if self.directory is None:
+            return None
+        try:
+            item = json.loads(self._path(key).read_text(encoding='utf-8'))
+        except Exception:
+            return None
+        if item.get('expires', 0) <= now:
+            try:
+                self._path(key).unlink()
+            except OSError:
+                pass
+            return None
+        return item.get('value')
+
+    def _disk_set(self, key, value, expires):
+        p = self._path(key)
+        tmp = p.with_name(f'{p.name}.{os.getpid()}.tmp')
+        try:
+            tmp.write_text(json.dumps({'expires': expires, 'value': value}, ensure_ascii=False), encoding='utf-8')
+            os.replace(str(tmp), str(p))
+        except Exception:
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+
+    def _disk_prune(self, now):
+        """Drop expired files and keep at most max_entries of the most recently written."""
+        try:
+            entries = []
+            for p in self.directory.glob('*.json'):
+                try:
+                    entries.append((p.stat().st_mtime, p))
+                except OSError:
+                    continue
+            entries.sort(reverse=True)
+            for i, (mtime, p) in enumerate(entries):
+                if i >= self.max_entries or mtime + self.ttl <= now:
+                    try:
+                        p.unlink()
+                    except OSError:
+                        pass
+        except Exception:
+            pass
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+        if self.directory is not None:
+            for p in self.directory.glob('*.json'):
+                try:
+                    p.unlink()
+                except OSError:
+                    pass
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'backend': 'memory+disk' if self.directory is not None else 'memory',
+                'entries': len(self._mem),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / total) if total else 0.0,
+            }
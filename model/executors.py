@@ -0,0 +1,93 @@
+"""Separate thread pools for I/O-bound and CPU-bound work inside a worker.
+
+With threaded gunicorn workers (deploy/gunicorn.conf.py) a slow provider call
+or Firestore write only parks a request thread, so `/predict` keeps flowing
+while chats wait. The two pools keep the kinds of work apart:
+
+ - `IO_POOL`: provider calls for `/chat` and Firestore persistence. Sized for many
+   concurrent waits; threads are idle while blocked on sockets.
+ - `CPU_POOL`: model predict / predict_proba. Kept small (default 1 per process,
+   since gunicorn already runs one process per core) so that many request
+   threads never run sklearn concurrently and oversubscribe the cores.
+
+Pools are created lazily per process (after gunicorn forks) and report their
+depth (queued + running tasks) for /ready and /metrics. A pool size of 0 runs
+the work inline in the calling thread, as does `run()` inside `inline()` (used
+while profiling a request, so the profiler sees the work).
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+_local = threading.local()
+
+
+@contextmanager
+def inline():
+    """Make WorkPool.run() execute in the calling thread until the block exits."""
+    prev = getattr(_local, 'inline', False)
+    _local.inline = True
+    try:
+        yield
+    finally:
+        _local.inline = prev
+
+
+class WorkPool:
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max(0, int(max_workers))
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pid = None
+        self._depth = 0
+        self.completed = 0
+
+    def _executor(self) -> ThreadPoolExecutor:
+        pid = os.getpid()
+        if self._pool is None or self._pid != pid:
+            with self._lock:
+                if self._pool is None or self._pid != pid:
+                    # a pool inherited across fork has no live threads; start fresh
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix=f'educare-{self.name}')
+                    self._pid = pid
+                    self._depth = 0
+        return self._pool
+
+    def depth(self) -> int:
+        return self._depth
+
+    def _done(self, _future) -> None:
+        with self._lock:
+            self._depth -= 1
+            self.completed += 1
+
+    def submit(self, fn: Callable, *args, **kwargs):
+        """Schedule fn on the pool and return its Future."""
+        ex = self._executor()
+        with self._lock:
+            self._depth += 1
+        try:
+            fut = ex.submit(fn, *args, **kwargs)
+        except Exception:
+            with self._lock:
+                self._depth -= 1
+            raise
+        fut.add_done_callback(self._done)
+        return fut
+
+    def run(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs):
+        """Run fn on the pool and wait for its result (inline when the pool size is 0)."""
+        if self.max_workers == 0 or getattr(_local, 'inline', False):
+            return fn(*args, **kwargs)
+        return self.submit(fn, *args, **kwargs).result(timeout=timeout)
+
+    def stats(self) -> Dict:
+        return {'workers': self.max_workers, 'depth': self._depth, 'completed': self.completed}
+
+
+IO_POOL = WorkPool('io', int(os.environ.get('EDUCARE_IO_THREADS') or 16))
+CPU_POOL = WorkPool('cpu', int(os.environ.get('EDUCARE_CPU_THREADS') or 1))
@@ -0,0 +1,106 @@
+"""Per-feature explanations for tree-ensemble predictions (Saabas decomposition).
+
+Following a sample from the root of a decision tree to its leaf, every split
+changes the node's class distribution; the change is credited to the split's
+feature. The prediction is then exactly
+
+    leaf probability = root probability (bias) + sum of per-feature changes
+
+and averaging over the trees of a forest gives the same identity for
+predict_proba().
+
+The per-node work is done once per model: `ForestExplainer` walks each tree
+level by level (vectorized over the nodes of a level) and stores, for every
+leaf, the accumulated per-feature changes on its root-to-leaf path. Explaining
+a batch is then, per tree, the leaf lookup predict_proba() also does plus one
+row gather, so it costs a small constant factor over plain prediction.
+
+Supported models: RandomForestClassifier, ExtraTreesClassifier and
+DecisionTreeClassifier, either bare or as the last step of a Pipeline whose
+earlier steps keep one column per feature (e.g. StandardScaler, as /train
+saves it). Contributions are then reported for the original features.
+"""
+from typing import Tuple
+
+
+class ExplainError(ValueError):
+    pass
+
+
+def _final_estimator(model):
+    if hasattr(model, 'steps'):
+        return model[:-1], model.steps[-1][1]
+    return None, model
+
+
+class ForestExplainer:
+    """Precomputed leaf contributions of a fitted tree classifier (see module docstring)."""
+
+    def __init__(self, model, n_features: int):
+        import numpy as np
+        from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+        from sklearn.tree import DecisionTreeClassifier
+        self.transform, est = _final_estimator(model)
+        if isinstance(est, (RandomForestClassifier, ExtraTreesClassifier)):
+            trees = est.estimators_
+        elif isinstance(est, DecisionTreeClassifier):
+            trees = [est]
+        else:
+            raise ExplainError(f'Explanations are not supported for {type(est).__name__}')
+        if getattr(est, 'n_outputs_', 1) != 1:
+            raise ExplainError('Explanations are not supported for multi-output models')
+        if getattr(est, 'n_features_in_', n_features) != n_features:
+            raise ExplainError('The model preprocessing changes the number of features; '
+                               'contributions cannot be mapped back to the inputs')
+        self.estimator = est
+        self.classes_ = est.classes_
+        self.n_features = n_features
+        self.n_classes = len(est.classes_)
+        self._trees = [tree.tree_ for tree in trees]
+        self._leaf_row = []
+        self._leaf_contrib = []
+        bias = np.zeros(self.n_classes)
+        for t in self._trees:
+            root, leaf_row, leaf_contrib = self._tree_contributions(t)
+            bias += root
+            self._leaf_row.append(leaf_row)
+            self._leaf_contrib.append(leaf_contrib)
+        self.n_trees = len(trees)
+        self.bias = bias / self.n_trees
+        self.nbytes = sum(a.nbytes + b.nbytes for a, b in zip(self._leaf_row, self._leaf_contrib))
+
+    def _tree_contributions(self, t):
+        import numpy as np
+        value = t.value[:, 0, :].astype(np.float64)
+        totals = value.sum(axis=1, keepdims=True)
+        frac = np.divide(value, totals, out=np.zeros_like(value), where=totals > 0)
+        left, right, feature = t.children_left, t.children_right, t.feature
+        # cumulative per-feature change from the root, filled one tree level at a time
+        cum = np.zeros((t.node_count, self.n_features, self.n_classes))
+        frontier = np.array([0])
+        while frontier.size:
+            parents = frontier[left[frontier] >= 0]
+            if not parents.size:
+                break
+            f = feature[parents]
+            for children in (left[parents], right[parents]):
+                cum[children] = cum[parents]
+                cum[children, f] += frac[children] - frac[parents]
+            frontier = np.concatenate([left[parents], right[parents]])
+        leaves = np.flatnonzero(left < 0)
+        leaf_row = np.full(t.node_count, -1, dtype=np.int32)
+        leaf_row[leaves] = np.arange(leaves.size, dtype=np.int32)
+        leaf_contrib = cum[leaves].reshape(leaves.size, -1)
+        return frac[0], leaf_row, leaf_contrib
+
+    def contributions(self, X) -> Tuple:
+        """(bias (classes,), contributions (rows, features, classes)) for a feature matrix in model order."""
+        import numpy as np
+        Xt = self.transform.transform(X) if self.transform is not None else X
+        # the trees' own leaf lookup, as predict_proba() does, minus the per-call joblib dispatch
+        Xt = np.ascontiguousarray(Xt, dtype=np.float32)
+        out = np.zeros((Xt.shape[0], self.n_features * self.n_classes))
+        for t, leaf_row, leaf_contrib in zip(self._trees, self._leaf_row, self._leaf_contrib):
+            out += leaf_contrib[leaf_row[t.apply(Xt)]]
+        out /= self.n_trees
+        return self.bias, out.reshape(-1, self.n_features, self.n_classes)
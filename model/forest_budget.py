@@ -0,0 +1,237 @@
+"""Shrink a fitted random forest to an inference latency or model size budget.
+
+/train can fit up to 500 unbounded-depth trees, which on three features buys
+little accuracy but costs artifact size, worker memory, load time and predict
+latency. `fit_budget()` runs after training and picks a smaller forest:
+
+Candidates are (first k trees, depth limit d). The trees of a random forest
+are exchangeable, so the first k are as good a subset as any. A depth limit
+truncates every tree: nodes at depth d become leaves predicting the class
+distribution they already hold, and the nodes below them are dropped, so the
+pickled model shrinks as well.
+
+Every candidate is scored on a holdout set against the full forest:
+agreement (share of identical predictions) and accuracy. This is cheap
+because, per depth, each truncated tree's holdout probabilities are computed
+once and any k-tree prefix is a running sum. Size is the pickled byte count
+(summed per tree). Latency of predict_proba() on a reference batch is timed
+for the largest and smallest k per depth and interpolated linearly in k,
+since per-tree cost dominates.
+
+Selection: candidates with agreement below `min_agreement` are rejected.
+Among the rest, those within every given budget compete on agreement, then
+accuracy, then fewest trees. If none is within budget, the smallest
+acceptable candidate is kept and the report says `budget_met: false`. The
+full report is stored in the model metadata under `pruning`. Callers that
+held the rows out of training can then refit() the selected configuration on
+all of them.
+"""
+import copy
+import pickle
+import statistics
+import time
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_MIN_AGREEMENT = 0.97
+DEFAULT_LATENCY_ROWS = 100
+MIN_TREES = 10
+DEPTHS = (16, 12, 10, 8, 6, 5, 4, 3)
+TREE_COUNTS = (10, 25, 50, 100, 200)
+
+
+class Budget:
+    """Targets for fit_budget(); None disables a target."""
+
+    def __init__(self, max_latency_ms: Optional[float] = None, max_size_kb: Optional[float] = None,
+                 min_agreement: float = DEFAULT_MIN_AGREEMENT, latency_rows: int = DEFAULT_LATENCY_ROWS):
+        self.max_latency_ms = max_latency_ms
+        self.max_size_kb = max_size_kb
+        self.min_agreement = min_agreement
+        self.latency_rows = max(1, int(latency_rows))
+
+    @property
+    def active(self) -> bool:
+        return self.max_latency_ms is not None or self.max_size_kb is not None
+
+    def fits(self, latency_ms: float, size_kb: float) -> bool:
+        return ((self.max_latency_ms is None or latency_ms <= self.max_latency_ms)
+                and (self.max_size_kb is None or size_kb <= self.max_size_kb))
+
+    def to_dict(self) -> Dict:
+        return {'max_latency_ms': self.max_latency_ms, 'max_size_kb': self.max_size_kb,
+                'min_agreement': self.min_agreement, 'latency_rows': self.latency_rows}
+
+
+def _node_depths(left, right):
+    import numpy as np
+    depth = np.zeros(left.shape[0], dtype=np.int64)
+    frontier = np.array([0])
+    while frontier.size:
+        parents = frontier[left[frontier] >= 0]
+        children = np.concatenate([left[parents], right[parents]])
+        depth[children] = depth[np.concatenate([parents, parents])] + 1
+        frontier = children
+    return depth
+
+
+def truncate_tree(est, depth: Optional[int]):
+    """Copy of a fitted DecisionTreeClassifier without the nodes below `depth` (est itself if none are)."""
+    import numpy as np
+    from sklearn.tree._tree import TREE_LEAF, TREE_UNDEFINED, Tree
+    t = est.tree_
+    if depth is None or t.max_depth <= depth:
+        return est
+    state = t.__getstate__()
+    nodes, values = state['nodes'], state['values']
+    node_depth = _node_depths(nodes['left_child'], nodes['right_child'])
+    keep = node_depth <= depth
+    # nodes are stored parent-before-child, so the kept ones keep their relative order
+    new_index = np.cumsum(keep) - 1
+    new_nodes = nodes[keep].copy()
+    cut = (node_depth[keep] == depth) & (new_nodes['left_child'] != TREE_LEAF)
+    internal = (new_nodes['left_child'] != TREE_LEAF) & ~cut
+    for field in ('left_child', 'right_child'):
+        new_nodes[field] = np.where(internal, new_index[np.maximum(new_nodes[field], 0)], TREE_LEAF)
+    new_nodes['feature'][cut] = TREE_UNDEFINED
+    new_nodes['threshold'][cut] = TREE_UNDEFINED
+    tree = Tree(t.n_features, np.asarray(t.n_classes, dtype=np.intp), t.n_outputs)
+    tree.__setstate__({'max_depth': depth, 'node_count': int(keep.sum()), 'nodes': new_nodes,
+                       'values': np.ascontiguousarray(values[keep])})
+    out = copy.copy(est)
+    out.tree_ = tree
+    out.max_depth = depth
+    return out
+
+
+def _split(model):
+    if hasattr(model, 'steps'):
+        return model[:-1], model.steps[-1][1]
+    return None, model
+
+
+def with_trees(model, trees):
+    """Copy of model (a forest or a Pipeline ending in one) using the given fitted trees."""
+    _, forest = _split(model)
+    forest = copy.copy(forest)
+    forest.estimators_ = list(trees)
+    forest.n_estimators = len(trees)
+    if not hasattr(model, 'steps'):
+        return forest
+    out = copy.copy(model)
+    out.steps = list(model.steps[:-1]) + [(model.steps[-1][0], forest)]
+    return out
+
+
+def refit(model, X, y, n_estimators: int, max_depth: Optional[int]):
+    """Fit an unfitted copy of model with n_estimators trees on (X, y), truncated to max_depth.
+
+    Forest trees are seeded in order, so these are the same trees fit_budget()
+    judged as "the first n_estimators", only grown on (X, y).
+    """
+    from sklearn.base import clone
+    fresh = clone(model)
+    _, forest = _split(fresh)
+    forest.set_params(n_estimators=n_estimators)
+    fresh.fit(X, y)
+    return with_trees(fresh, [truncate_tree(t, max_depth) for t in forest.estimators_])
+
+
+def pickled_kb(obj) -> float:
+    return len(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)) / 1024.0
+
+
+def _time_predict(model, X, repeats: int = 5) -> float:
+    model.predict_proba(X)
+    samples = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        model.predict_proba(X)
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples) * 1000.0
+
+
+def _tree_counts(n: int) -> List[int]:
+    counts = {n}
+    k = n
+    while k // 2 >= MIN_TREES:
+        k //= 2
+        counts.add(k)
+    counts.update(c for c in TREE_COUNTS if c < n)
+    return sorted(counts)
+
+
+def fit_budget(model, X_hold, y_hold, budget: Budget) -> Tuple[object, Optional[Dict]]:
+    """Return (model to save, report). The model is unchanged when no budget is active or it is not a forest."""
+    import numpy as np
+    from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+    if not budget.active:
+        return model, None
+    transform, forest = _split(model)
+    if not isinstance(forest, (RandomForestClassifier, ExtraTreesClassifier)):
+        return model, {'skipped': f'not a forest ({type(forest).__name__})', 'budget': budget.to_dict()}
+    t_start = time.perf_counter()
+    X_hold = np.asarray(X_hold, dtype=np.float64)
+    y_hold = np.asarray(y_hold)
+    Xt = np.ascontiguousarray(transform.transform(X_hold) if transform is not None else X_hold, dtype=np.float32)
+    rng = np.random.default_rng(0)
+    X_ref = X_hold[rng.integers(0, len(X_hold), budget.latency_rows)]
+    classes = forest.classes_
+    trees = forest.estimators_
+    n = len(trees)
+    full_pred = model.predict(X_hold)
+    counts = _tree_counts(n)
+    max_depth = max(t.tree_.max_depth for t in trees)
+    depths = [None] + [d for d in DEPTHS if d < max_depth]
+    base_kb = pickled_kb(with_trees(model, []))
+
+    rows = []
+    truncated = {}
+    for d in depths:
+        cut = [truncate_tree(t, d) for t in trees]
+        truncated[d] = cut
+        sizes = np.cumsum([pickled_kb(t) for t in cut])
+        t_hi = _time_predict(with_trees(model, cut), X_ref)
+        t_lo = _time_predict(with_trees(model, cut[:counts[0]]), X_ref)
+        slope = (t_hi - t_lo) / (n - counts[0]) if n > counts[0] else 0.0
+        proba = np.zeros((len(Xt), len(classes)))
+        k_next = iter(counts)
+        k_want = next(k_next)
+        for k, t in enumerate(cut, start=1):
+            p = t.tree_.predict(Xt).reshape(len(Xt), -1)
+            proba += p / np.maximum(p.sum(axis=1, keepdims=True), 1e-12)
+            if k == k_want:
+                pred = classes[np.argmax(proba, axis=1)]
+                rows.append({'n_estimators': k, 'max_depth': d,
+                             'agreement': float(np.mean(pred == full_pred)),
+                             'accuracy': float(np.mean(pred == y_hold)),
+                             'size_kb': round(base_kb + float(sizes[k - 1]), 1),
+                             'latency_ms': round(t_lo + slope * (k - counts[0]), 3)})
+                k_want = next(k_next, None)
+
+    full = next(r for r in rows if r['n_estimators'] == n and r['max_depth'] is None)
+    acceptable = [r for r in rows if r['agreement'] >= budget.min_agreement]
+    within = [r for r in acceptable if budget.fits(r['latency_ms'], r['size_kb'])]
+    if within:
+        chosen = max(within, key=lambda r: (r['agreement'], r['accuracy'], -r['n_estimators'], -r['size_kb']))
+    elif not acceptable:
+        # only possible with min_agreement > 1; keep the forest as trained
+        chosen = full
+    else:
+        chosen = min(acceptable, key=lambda r: (r['latency_ms'] if budget.max_latency_ms is not None else 0,
+                                                r['size_kb']))
+    pruned = model
+    if chosen is not full:
+        pruned = with_trees(model, truncated[chosen['max_depth']][:chosen['n_estimators']])
+    measured = {'latency_ms': round(_time_predict(pruned, X_ref), 3), 'size_kb': round(pickled_kb(pruned), 1)}
+    report = {
+        'budget': budget.to_dict(),
+        'holdout_rows': int(len(X_hold)),
+        'original': {k: full[k] for k in ('n_estimators', 'max_depth', 'accuracy', 'size_kb', 'latency_ms')},
+        'selected': {**chosen, **measured, 'accuracy_loss': round(full['accuracy'] - chosen['accuracy'], 4)},
+        'budget_met': bool(within) and budget.fits(measured['latency_ms'], measured['size_kb']),
+        'candidates': {'columns': ['n_estimators', 'max_depth', 'agreement', 'accuracy', 'size_kb', 'latency_ms'],
+                       'rows': [[r['n_estimators'], r['max_depth'], round(r['agreement'], 4), round(r['accuracy'], 4),
+                                 r['size_kb'], r['latency_ms']] for r in rows]},
+        'search_ms': round((time.perf_counter() - t_start) * 1000.0, 1),
+    }
+    return pruned, report
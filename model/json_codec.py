@@ -0,0 +1,68 @@
+"""Fast JSON encoding for API responses.
+
+`dumps()` produces compact UTF-8 bytes. It uses orjson when it is installed
+(serializing NumPy arrays and scalars natively, so prediction outputs need no
+per-value float()/int() conversion) and falls back to the standard library
+with a `default` hook that converts NumPy types. `JSONProvider` plugs the same
+encoder into Flask, so every `jsonify()` in the app uses it.
+
+Differences from Flask's default provider: keys are not sorted (rows keep the
+client's field order) and, with orjson, NaN/Infinity are written as null
+instead of the non-standard NaN literal. Set EDUCARE_JSON=std to force the
+standard library.
+"""
+import datetime
+import json
+import os
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+if os.environ.get('EDUCARE_JSON', '').lower() in ('std', 'stdlib', 'json'):
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+_ORJSON_OPTS = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS) if orjson is not None else 0
+
+
+def _default(obj: Any):
+    # NumPy scalars/arrays without importing numpy up front
+    if hasattr(obj, 'tolist') and type(obj).__module__ == 'numpy':
+        return obj.tolist()
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialize obj to compact JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTS)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class JSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by dumps()/loads() above."""
+
+    def dumps(self, obj: Any, **kwargs) -> str:
+        return dumps(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs) -> Any:
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype=self.mimetype)
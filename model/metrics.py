@@ -0,0 +1,270 @@
+"""Always-on request/stage timing with fixed-bucket histograms and Prometheus text output.
+
+Recording an observation is a bisect over a short tuple of bucket bounds plus
+a few integer increments under a lock, so it is cheap enough to leave enabled
+in production. Each gunicorn worker keeps its own registry. When a metrics
+directory is configured, workers also dump snapshots there and /metrics merges
+them, so a scrape sees totals for the whole host and not only for the worker
+that answered. When a worker exits, gunicorn's master folds its snapshot into
+retired.json and removes it (retire_worker(), see deploy/gunicorn.conf.py),
+so host totals never go down: neither when a dead worker's file would linger
+nor when a new worker reuses its pid.
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+# Upper bounds in seconds; chosen to resolve sub-millisecond stages as well as
+# multi-second provider calls and training runs.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(v) -> str:
+    return str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra='') -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _fmt(v) -> str:
+    if isinstance(v, bool):
+        return '1' if v else '0'
+    if v == float('inf'):
+        return '+Inf'
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self) -> Dict:
+        return {'counts': list(self.counts), 'sum': self.sum, 'count': self.count}
+
+    def merge(self, d: Dict) -> None:
+        counts = d.get('counts') or []
+        if len(counts) != len(self.counts):
+            return
+        for i, c in enumerate(counts):
+            self.counts[i] += c
+        self.sum += d.get('sum', 0.0)
+        self.count += d.get('count', 0)
+
+
+RETIRED_FILE = 'retired.json'
+
+
+def _empty_totals() -> Dict:
+    return {'requests': {}, 'stages': {}, 'status': {}}
+
+
+def _add_snapshot(totals: Dict, snap: Dict, buckets) -> None:
+    for kind in ('requests', 'stages'):
+        target = totals[kind]
+        for k, d in snap.get(kind, []):
+            h = target.get(tuple(k))
+            if h is None:
+                h = target[tuple(k)] = Histogram(buckets)
+            h.merge(d)
+    status = totals['status']
+    for k, v in snap.get('status', []):
+        status[tuple(k)] = status.get(tuple(k), 0) + v
+
+
+def _totals_snapshot(totals: Dict) -> Dict:
+    return {
+        'requests': [[list(k), h.to_dict()] for k, h in totals['requests'].items()],
+        'stages': [[list(k), h.to_dict()] for k, h in totals['stages'].items()],
+        'status': [[list(k), v] for k, v in totals['status'].items()],
+    }
+
+
+def _read_snapshot(path: Path) -> Optional[Dict]:
+    try:
+        return json.loads(path.read_text(encoding='utf-8'))
+    except Exception:
+        return None
+
+
+def retire_worker(directory: str, pid: Optional[int] = None, buckets=DEFAULT_BUCKETS) -> None:
+    """Fold a dead worker's snapshot (every worker's if pid is None) into retired.json and remove it.
+
+    Called from the gunicorn master only (child_exit / on_starting), so there is
+    one writer of retired.json.
+    """
+    directory = Path(directory)
+    paths = sorted(directory.glob('worker-*.json')) if pid is None else [directory / f'worker-{pid}.json']
+    paths = [p for p in paths if p.exists()]
+    if not paths:
+        return
+    retired = directory / RETIRED_FILE
+    totals = _empty_totals()
+    _add_snapshot(totals, _read_snapshot(retired) or {}, tuple(buckets))
+    for p in paths:
+        _add_snapshot(totals, _read_snapshot(p) or {}, tuple(buckets))
+    tmp = retired.with_suffix('.tmp')
+    tmp.write_text(json.dumps(_totals_snapshot(totals)), encoding='utf-8')
+    os.replace(str(tmp), str(retired))
+    for p in paths:
+        try:
+            p.unlink()
+        except OSError:
+            pass
+
+
+class Registry:
+    def __init__(self, buckets=DEFAULT_BUCKETS, directory: Optional[str] = None, flush_interval: float = 5.0):
+        self.buckets = tuple(buckets)
+        self.directory = Path(directory) if directory else None
+        self.flush_interval = float(flush_interval)
+        self._lock = threading.Lock()
+        self._requests: Dict[Tuple[str], Histogram] = {}
+        self._stages: Dict[Tuple[str, str], Histogram] = {}
+        self._status: Dict[Tuple[str, str, str], int] = {}
+        self._gauges: Dict[str, Tuple[str, Callable]] = {}
+        self._last_flush = 0.0
+        # one flush at a time per process: they share worker-<pid>.tmp
+        self._flush_lock = threading.Lock()
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> 'Registry':
+        return cls(directory=os.environ.get('EDUCARE_METRICS_DIR') or None)
+
+    # -- recording -----------------------------------------------------
+    def observe_request(self, route: str, method: str, status: int, seconds: float) -> None:
+        with self._lock:
+            h = self._requests.get((route,))
+            if h is None:
+                h = self._requests[(route,)] = Histogram(self.buckets)
+            h.observe(seconds)
+            key = (route, method, str(status))
+            self._status[key] = self._status.get(key, 0) + 1
+        if self.directory is not None:
+            self.maybe_flush()
+
+    def observe_stage(self, route: str, stage: str, seconds: float) -> None:
+        with self._lock:
+            h = self._stages.get((route, stage))
+            if h is None:
+                h = self._stages[(route, stage)] = Histogram(self.buckets)
+            h.observe(seconds)
+
+    @contextmanager
+    def stage(self, route: str, stage: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(route, stage, time.perf_counter() - t0)
+
+    def register_gauge(self, name: str, help_text: str, fn: Callable) -> None:
+        """Register a gauge read at scrape time. `fn` returns a number or a {label_value: number} dict."""
+        self._gauges[name] = (help_text, fn)
+
+    # -- multi-worker snapshots ----------------------------------------
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'requests': [[list(k), h.to_dict()] for k, h in self._requests.items()],
+                'stages': [[list(k), h.to_dict()] for k, h in self._stages.items()],
+                'status': [[list(k), v] for k, v in self._status.items()],
+            }
+
+    def maybe_flush(self, force: bool = False) -> None:
+        # a request thread that finds another flush running skips; the next interval covers it
+        if not self._flush_lock.acquire(blocking=force):
+            return
+        try:
+            now = time.monotonic()
+            if not force and now - self._last_flush < self.flush_interval:
+                return
+            self._last_flush = now
+            p = self.directory / f'worker-{os.getpid()}.json'
+            tmp = p.with_suffix('.tmp')
+            try:
+                tmp.write_text(json.dumps(self.snapshot()), encoding='utf-8')
+                os.replace(str(tmp), str(p))
+            except Exception:
+                pass
+        finally:
+            self._flush_lock.release()
+
+    def _merged(self) -> Dict:
+        if self.directory is None:
+            return self.snapshot()
+        self.maybe_flush(force=True)
+        totals = _empty_totals()
+        for p in [self.directory / RETIRED_FILE] + list(self.directory.glob('worker-*.json')):
+            snap = _read_snapshot(p)
+            if snap is not None:
+                _add_snapshot(totals, snap, self.buckets)
+        return _totals_snapshot(totals)
+
+    # -- exposition ----------------------------------------------------
+    def _histogram_lines(self, name, label_names, items):
+        lines = []
+        bounds = list(self.buckets) + [float('inf')]
+        for key, d in sorted(items, key=lambda kv: kv[0]):
+            cum = 0
+            for le, c in zip(bounds, d['counts']):
+                cum += c
+                le_label = 'le="%s"' % _fmt(le)
+                lines.append(f'{name}_bucket{_labels(label_names, key, le_label)} {cum}')
+            lines.append(f'{name}_sum{_labels(label_names, key)} {_fmt(d["sum"])}')
+            lines.append(f'{name}_count{_labels(label_names, key)} {d["count"]}')
+        return lines
+
+    def render(self) -> str:
+        snap = self._merged()
+        out = [
+            '# HELP educare_request_duration_seconds Time spent handling a request, by route.',
+            '# TYPE educare_request_duration_seconds histogram',
+        ]
+        out += self._histogram_lines('educare_request_duration_seconds', ('route',), snap['requests'])
+        out += [
+            '# HELP educare_stage_duration_seconds Time spent in a named stage of a request.',
+            '# TYPE educare_stage_duration_seconds histogram',
+        ]
+        out += self._histogram_lines('educare_stage_duration_seconds', ('route', 'stage'), snap['stages'])
+        out += [
+            '# HELP educare_requests_total Requests handled, by route, method and status code.',
+            '# TYPE educare_requests_total counter',
+        ]
+        for key, v in sorted(snap['status']):
+            out.append(f'educare_requests_total{_labels(("route", "method", "status"), key)} {v}')
+        for name, (help_text, fn) in sorted(self._gauges.items()):
+            try:
+                value = fn()
+            except Exception:
+                continue
+            out.append(f'# HELP {name} {help_text}')
+            out.append(f'# TYPE {name} gauge')
+            if isinstance(value, dict):
+                for label, v in sorted(value.items()):
+                    if v is not None:
+                        out.append(f'{name}{{name="{_escape(label)}"}} {_fmt(v)}')
+            elif value is not None:
+                out.append(f'{name} {_fmt(value)}')
+        return '\n'.join(out) + '\n'
@@ -0,0 +1,234 @@
+"""On-demand profiling of single requests, for admins.
+
+A request that carries `X-Educare-Profile` together with a valid
+`x-admin-api-key` (EDUCARE_ADMIN_API_KEY) is run under a profiler:
+
+    X-Educare-Profile: cpu   cProfile (deterministic, per function call counts and times)
+    X-Educare-Profile: mem   tracemalloc (peak traced memory, top net allocation sites)
+    X-Educare-Profile: 1     both
+
+The response is returned as usual with an `X-Educare-Profile-Id` header; the
+profile can then be read from GET /admin/profiles/<id> (summary JSON) and
+downloaded from /admin/profiles/<id>/pstats (for pstats, snakeviz, ...).
+
+`ProfilingMiddleware` is only installed when EDUCARE_ADMIN_API_KEY is set, and
+then costs one environ lookup per request; requests without the header run
+exactly as before. While a request is profiled:
+
+ - executor pool work (model predict, Firestore writes, provider calls) runs
+   inline in the request thread (executors.inline()) so cProfile sees it;
+ - a streamed body is collected before it is sent, so the profile covers it;
+ - tracemalloc traces the whole process, so other requests served during
+   the window are slower and their allocations count towards the peak.
+
+One request per process is profiled at a time; a second one is served
+unprofiled with `X-Educare-Profile: busy`. Profiles are files in
+EDUCARE_PROFILE_DIR (default a temp directory, shared by the workers on a host),
+and only the newest EDUCARE_PROFILE_KEEP (default 20) are kept.
+"""
+import hmac
+import json
+import logging
+import os
+import re
+import secrets
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Dict, List, Optional
+
+HEADER = 'X-Educare-Profile'
+ID_HEADER = 'X-Educare-Profile-Id'
+MODES = {'cpu': ('cpu',), 'mem': ('mem',), '1': ('cpu', 'mem'), 'all': ('cpu', 'mem'), 'true': ('cpu', 'mem')}
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 25
+_ID_RE = re.compile(r'^[0-9]{8}-[0-9]{9}-[0-9a-f]{6}$')
+
+LOG = logging.getLogger('educare_api')
+
+
+class ProfileStore:
+    """Bounded set of saved profiles: <id>.json (summary) and <id>.prof (pstats dump)."""
+
+    def __init__(self, directory: Path, keep: int = 20):
+        self.directory = Path(directory)
+        self.keep = max(1, int(keep))
+
+    @classmethod
+    def from_env(cls) -> 'ProfileStore':
+        directory = os.environ.get('EDUCARE_PROFILE_DIR') or Path(tempfile.gettempdir()) / 'educare-profiles'
+        return cls(directory, int(os.environ.get('EDUCARE_PROFILE_KEEP') or 20))
+
+    @staticmethod
+    def new_id() -> str:
+        # sorts by creation time; the random suffix keeps ids from concurrent workers apart
+        now = time.time()
+        return time.strftime('%Y%m%d-%H%M%S', time.localtime(now)) + f'{int(now * 1000) % 1000:03d}-{secrets.token_hex(3)}'
+
+    @staticmethod
+    def valid_id(profile_id: str) -> bool:
+        return bool(_ID_RE.match(profile_id or ''))
+
+    def pstats_path(self, profile_id: str) -> Path:
+        return self.directory / f'{profile_id}.prof'
+
+    def save(self, summary: Dict, profiler=None) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        pid = summary['id']
+        if profiler is not None:
+            profiler.dump_stats(str(self.pstats_path(pid)))
+        tmp = self.directory / f'{pid}.json.tmp'
+        tmp.write_text(json.dumps(summary), encoding='utf-8')
+        os.replace(tmp, self.directory / f'{pid}.json')
+        self._trim()
+
+    def _trim(self) -> None:
+        for old in sorted(self.directory.glob('*.json'))[:-self.keep]:
+            for path in (old, self.pstats_path(old.stem)):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    def get(self, profile_id: str) -> Optional[Dict]:
+        if not self.valid_id(profile_id):
+            return None
+        try:
+            return json.loads((self.directory / f'{profile_id}.json').read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+
+    def list(self) -> List[Dict]:
+        """Newest first, without the per-function and per-allocation tables."""
+        out = []
+        if not self.directory.is_dir():
+            return out
+        for path in sorted(self.directory.glob('*.json'), reverse=True):
+            summary = self.get(path.stem)
+            if summary is not None:
+                out.append({k: v for k, v in summary.items() if k not in ('functions', 'allocations')})
+        return out
+
+
+def _function_table(profiler, limit: int = TOP_FUNCTIONS) -> List[Dict]:
+    import pstats
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, name), (_cc, calls, tottime, cumtime, _callers) in stats.stats.items():
+        rows.append({'function': f'{filename}:{line}({name})', 'calls': calls,
+                     'tottime_ms': round(tottime * 1000.0, 3), 'cumtime_ms': round(cumtime * 1000.0, 3)})
+    rows.sort(key=lambda r: r['cumtime_ms'], reverse=True)
+    return rows[:limit]
+
+
+def _allocation_table(before, after, limit: int = TOP_ALLOCATIONS) -> List[Dict]:
+    rows = []
+    for stat in after.compare_to(before, 'lineno')[:limit]:
+        rows.append({'where': str(stat.traceback[0]), 'size_kb': round(stat.size_diff / 1024.0, 1),
+                     'count': stat.count_diff})
+    return rows
+
+
+class ProfilingMiddleware:
+    """WSGI middleware that profiles requests carrying the profile header (see module docstring)."""
+
+    def __init__(self, app, admin_key: str, store: ProfileStore, inline=None):
+        self.app = app
+        self.admin_key = admin_key
+        self.store = store
+        # context manager factory that keeps pool work in the request thread
+        self.inline = inline
+        self._busy = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        mode = environ.get('HTTP_X_EDUCARE_PROFILE')
+        if not mode:
+            return self.app(environ, start_response)
+        kinds = MODES.get(mode.strip().lower())
+        incoming = environ.get('HTTP_X_ADMIN_API_KEY', '')
+        if kinds is None or not hmac.compare_digest(incoming.encode('utf-8'), self.admin_key.encode('utf-8')):
+            return self._error(start_response, 401 if kinds is not None else 400,
+                               'Unauthorized: profiling requires a valid x-admin-api-key' if kinds is not None
+                               else f'{HEADER} must be one of: {", ".join(sorted(MODES))}')
+        if not self._busy.acquire(blocking=False):
+            def busy_start_response(status, headers, exc_info=None):
+                return start_response(status, list(headers) + [(HEADER, 'busy')], exc_info)
+            return self.app(environ, busy_start_response)
+        try:
+            return self._profile(environ, start_response, kinds)
+        finally:
+            self._busy.release()
+
+    def _profile(self, environ, start_response, kinds):
+        import cProfile
+        import tracemalloc
+        profile_id = self.store.new_id()
+        captured = {}
+
+        def profiled_start_response(status, headers, exc_info=None):
+            captured['status'] = status
+            return start_response(status, list(headers) + [(ID_HEADER, profile_id)], exc_info)
+
+        profiler = cProfile.Profile() if 'cpu' in kinds else None
+        trace_mem = 'mem' in kinds
+        started_tracing = trace_mem and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if trace_mem:
+            tracemalloc.reset_peak()
+            before = tracemalloc.take_snapshot()
+        wall0 = time.perf_counter()
+        cpu0 = time.thread_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            with self.inline() if self.inline is not None else nullcontext():
+                result = self.app(environ, profiled_start_response)
+                try:
+                    body = list(result)
+                finally:
+                    if hasattr(result, 'close'):
+                        result.close()
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            wall = time.perf_counter() - wall0
+            cpu = time.thread_time() - cpu0
+            summary = {
+                'id': profile_id,
+                'created_at': time.time(),
+                'pid': os.getpid(),
+                'method': environ.get('REQUEST_METHOD'),
+                'path': environ.get('PATH_INFO'),
+                'query': environ.get('QUERY_STRING') or '',
+                'status': int(str(captured.get('status', '500')).split()[0]),
+                'modes': list(kinds),
+                'wall_ms': round(wall * 1000.0, 3),
+                'thread_cpu_ms': round(cpu * 1000.0, 3),
+            }
+            if trace_mem:
+                after = tracemalloc.take_snapshot()
+                _current, peak = tracemalloc.get_traced_memory()
+                if started_tracing:
+                    tracemalloc.stop()
+                summary['peak_traced_kb'] = round(peak / 1024.0, 1)
+                summary['allocations'] = _allocation_table(before, after)
+            if profiler is not None:
+                summary['functions'] = _function_table(profiler)
+            try:
+                self.store.save(summary, profiler)
+                LOG.info('Profiled %s %s in %.1f ms as %s', summary['method'], summary['path'],
+                         summary['wall_ms'], profile_id)
+            except OSError as e:
+                LOG.warning('Could not save profile %s: %s', profile_id, e)
+        return body
+
+    @staticmethod
+    def _error(start_response, status: int, message: str):
+        reason = {400: 'BAD REQUEST', 401: 'UNAUTHORIZED'}[status]
+        body = json.dumps({'error': message}).encode('utf-8')
+        start_response(f'{status} {reason}', [('Content-Type', 'application/json'),
+                                              ('Content-Length', str(len(body)))])
+        return [body]
@@ -0,0 +1,143 @@
+"""Budgeted prompt assembly for /chat.
+
+The prompt is limited to a character budget (tokens are estimated as
+characters / 4). Parts are admitted in priority order:
+
+ 1. system messages and the closing assistant instruction
+ 2. the newest user turn
+ 3. the client `context` (capped to a share of the budget)
+ 4. the most recent `keep_turns` turns, verbatim
+ 5. retrieved project passages
+ 6. older turns, each compressed to a short one-line snippet, newest first
+
+Whatever does not fit is dropped and counted. Parts are collected in lists and
+joined once, so assembly is linear in the size of the output.
+"""
+import json
+from typing import Dict, List, Optional, Tuple
+
+CHARS_PER_TOKEN = 4
+ASSISTANT_SUFFIX = ("Assistant: You are EduCare assistant that helps admins, counselors, parents and students. "
+                    "Provide concise, actionable, empathetic guidance and reference student data when available.")
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _clip(text: str, limit: int) -> str:
+    if limit <= 0:
+        return ''
+    if len(text) <= limit:
+        return text
+    if limit <= 3:
+        return text[:limit]
+    return text[:limit - 3].rstrip() + '...'
+
+
+def _format_turn(m: Dict) -> str:
+    prefix = 'User' if m.get('role') == 'user' else 'Assistant'
+    return f"{prefix}: {m.get('content', '')}\n"
+
+
+def build_prompt(messages: List[Dict], context: Optional[Dict] = None, passages: Optional[List[Dict]] = None,
+                 budget_chars: int = 12000, keep_turns: int = 4, context_share: float = 0.25,
+                 summary_chars: int = 160) -> Tuple[str, Dict]:
+    """Return (prompt, meta) for the conversation within `budget_chars`.
+
+    `passages` are retrieved snippets as returned by the RAG index (dicts with
+    'source' and 'text'). `meta` reports the final size and what was kept.
+    """
+    budget = max(0, int(budget_chars))
+    system_parts = [str(m.get('content', '')) for m in messages if m.get('role') == 'system']
+    turns = [m for m in messages if m.get('role') in ('user', 'assistant')]
+
+    system_text = ('\n'.join(system_parts) + '\n---\n') if system_parts else ''
+    system_text = _clip(system_text, max(0, budget - len(ASSISTANT_SUFFIX)))
+    remaining = budget - len(system_text) - len(ASSISTANT_SUFFIX)
+
+    # newest user turn is always kept (clipped if it alone exceeds the budget)
+    last_user_idx = None
+    for i in range(len(turns) - 1, -1, -1):
+        if turns[i].get('role') == 'user':
+            last_user_idx = i
+            break
+    full = {}
+    if last_user_idx is not None:
+        t = _format_turn(turns[last_user_idx])
+        if len(t) > remaining:
+            t = _clip(t.rstrip('\n'), max(0, remaining - 1)) + '\n'
+        full[last_user_idx] = t
+        remaining -= len(t)
+
+    ctx_text = ''
+    if context:
+        try:
+            raw_ctx = json.dumps(context, ensure_ascii=False, separators=(',', ':'))
+            ctx_limit = min(remaining, int(budget * context_share))
+            # 'Context: ' + '\n---\n' wrapper is 14 characters
+            if ctx_limit > 14:
+                ctx_text = f"Context: {_clip(raw_ctx, ctx_limit - 14)}\n---\n"
+                remaining -= len(ctx_text)
+        except Exception:
+            ctx_text = ''
+
+    # recent turns verbatim, newest first
+    recent_floor = max(0, len(turns) - max(1, int(keep_turns)))
+    for i in range(len(turns) - 1, recent_floor - 1, -1):
+        if i in full:
+            continue
+        t = _format_turn(turns[i])
+        if len(t) > remaining:
+            break
+        full[i] = t
+        remaining -= len(t)
+
+    rag_parts = []
+    rag_used = 0
+    if passages:
+        header = '\nProject context (retrieved snippets):\n'
+        for p in passages:
+            block = f"Source: {p.get('source')}\n{p.get('text') or ''}\n---\n"
+            cost = len(block) + (len(header) + 1 if not rag_parts else 0)
+            if cost > remaining:
+                # passages arrive best-first; stop at the first that does not fit
+                break
+            if not rag_parts:
+                rag_parts.append(header)
+            rag_parts.append(block)
+            remaining -= cost
+            rag_used += 1
+        if rag_parts:
+            rag_parts.append('\n')
+
+    # older turns compressed to one-line snippets, newest first
+    compressed = {}
+    dropped = 0
+    for i in range(len(turns) - 1, -1, -1):
+        if i in full:
+            continue
+        m = turns[i]
+        prefix = 'User' if m.get('role') == 'user' else 'Assistant'
+        text = ' '.join(str(m.get('content', '')).split())
+        line = f"{prefix} (earlier): {_clip(text, summary_chars)}\n"
+        if len(line) > remaining:
+            dropped += 1
+            continue
+        compressed[i] = line
+        remaining -= len(line)
+
+    conv = [full.get(i) or compressed.get(i) for i in range(len(turns)) if i in full or i in compressed]
+    prompt = ''.join(rag_parts + [system_text, ctx_text] + conv + [ASSISTANT_SUFFIX])
+    meta = {
+        'chars': len(prompt),
+        'tokens_est': estimate_tokens(prompt),
+        'budget_chars': budget,
+        'turns_total': len(turns),
+        'turns_full': len(full),
+        'turns_compressed': len(compressed),
+        'turns_dropped': dropped,
+        'context_chars': len(ctx_text),
+        'rag_passages': rag_used,
+    }
+    return prompt, meta
@@ -0,0 +1,372 @@
+"""Pooled HTTP client for the generative provider used by /chat.
+
+The Generative Language API accepts a few request shapes depending on the
+account and API version (key as query parameter, bearer header, or the v1
+`models:generate` form). Rather than trying all of them on every message, the
+client remembers which variant last succeeded for a model and tries it first.
+All attempts for one call share a single deadline, so the worst case is bounded
+by the deadline rather than by the number of attempts times the timeout.
+
+`generate_stream()` uses the provider's server-sent-events endpoint
+(`streamGenerateContent?alt=sse`) and yields text deltas as they arrive. If the
+endpoint is not available for a model, that is remembered too and the call
+falls back to `generate()`, delivering the whole reply as one delta.
+
+One `requests.Session` (keep-alive connection pool) is created lazily per
+worker process; gunicorn forks workers after import, so the session is keyed on
+the pid and never shared across a fork.
+
+A per-process circuit breaker tracks provider outages: after
+`failure_threshold` consecutive failed calls (no response, timeouts, 429 or
+5xx) it opens and callers are expected to check `breaker.allow()` and answer
+without calling out. After `reset_timeout` seconds one probe call is let
+through (half-open); its outcome closes or re-opens the circuit.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+LOG = logging.getLogger('educare_api')
+
+DEFAULT_BASE_URL = 'https://generativelanguage.googleapis.com'
+
+# Variant names double as the 'attempt' labels reported in error details.
+VARIANTS = ('query_key', 'auth_header', 'v1_models_generate')
+
+
+def extract_reply(raw) -> Optional[str]:
+    """Pull the generated text out of a provider response (PaLM- or Gemini-style)."""
+    if not isinstance(raw, dict):
+        return None
+    if 'candidates' in raw and isinstance(raw['candidates'], list) and raw['candidates']:
+        cand = raw['candidates'][0] or {}
+        out = cand.get('output') or cand.get('content')
+        if isinstance(out, dict):
+            # Gemini: candidates[0].content.parts[*].text
+            parts = out.get('parts') or []
+            return ''.join(str(p.get('text') or '') for p in parts if isinstance(p, dict))
+        return out
+    if 'outputs' in raw and isinstance(raw['outputs'], list) and raw['outputs']:
+        # outputs[*].text or outputs[*].content
+        out = raw['outputs'][0]
+        return out.get('text') or out.get('content') or out.get('output')
+    return None
+
+
+class ProviderResult:
+    """Outcome of a provider call: the last response seen plus per-attempt errors."""
+
+    __slots__ = ('status_code', 'raw', 'text', 'variant', 'errors', 'elapsed')
+
+    def __init__(self, status_code=None, raw=None, text='', variant=None, errors=None, elapsed=0.0):
+        self.status_code = status_code
+        self.raw = raw
+        self.text = text
+        self.variant = variant
+        self.errors = errors if errors is not None else []
+        self.elapsed = elapsed
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code == 200
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = float(reset_timeout)
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.opens = 0
+        self.rejected = 0
+        self._probe_started = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """True if a call may go out now; in half-open state only one probe at a time is allowed."""
+        if self.state == self.CLOSED:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            if self.state == self.OPEN and now - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probe_started = None
+            if self.state == self.HALF_OPEN:
+                # a probe whose caller went away (e.g. abandoned stream) must not block recovery forever
+                if self._probe_started is None or now - self._probe_started >= self.reset_timeout:
+                    self._probe_started = now
+                    return True
+            if self.state == self.CLOSED:
+                return True
+            self.rejected += 1
+            return False
+
+    def retry_after(self) -> int:
+        if self.state != self.OPEN or self.opened_at is None:
+            return 1
+        return max(1, int(self.reset_timeout - (time.monotonic() - self.opened_at) + 0.999))
+
+    def record_success(self) -> None:
+        if self.state == self.CLOSED and self.failures == 0:
+            return
+        with self._lock:
+            if self.state != self.CLOSED:
+                LOG.info('Provider circuit closed after a successful call')
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_started = None
+
+    def abandon(self) -> None:
+        """The caller went away before the outcome was known: record nothing, but free the half-open probe."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probe_started = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                LOG.warning('Provider circuit opened after %d consecutive failures', self.failures)
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self.opens += 1
+                self._probe_started = None
+
+    def snapshot(self) -> Dict:
+        return {
+            'state': self.state,
+            'consecutive_failures': self.failures,
+            'opens': self.opens,
+            'rejected': self.rejected,
+            'retry_after': self.retry_after() if self.state == self.OPEN else None,
+        }
+
+
+def _is_outage(result: 'ProviderResult') -> bool:
+    """Failures that say the provider is down or overloaded (not a bad key or request)."""
+    if result.ok:
+        return False
+    if result.errors and all(e.get('exception') == 'deadline exceeded' for e in result.errors):
+        return False  # the caller's budget ran out before any attempt was made
+    return result.status_code is None or result.status_code == 429 or result.status_code >= 500
+
+
+class ProviderClient:
+    def __init__(self, base_url: Optional[str] = None, attempt_timeout: float = 30.0,
+                 connect_timeout: float = 5.0, deadline: float = 30.0, pool_size: int = 10,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.base_url = (base_url or DEFAULT_BASE_URL).rstrip('/')
+        self.attempt_timeout = float(attempt_timeout)
+        self.connect_timeout = float(connect_timeout)
+        self.deadline = float(deadline)
+        self.pool_size = int(pool_size)
+        self._session = None
+        self._session_pid = None
+        self._lock = threading.Lock()
+        # model name -> variant name that last returned 200
+        self._preferred: Dict[str, str] = {}
+        # model name -> whether the SSE streaming endpoint worked last time
+        self._stream_ok: Dict[str, bool] = {}
+        self.breaker = breaker or CircuitBreaker()
+
+    @classmethod
+    def from_env(cls) -> 'ProviderClient':
+        return cls(
+            base_url=os.environ.get('GEMINI_API_BASE') or DEFAULT_BASE_URL,
+            attempt_timeout=float(os.environ.get('EDUCARE_CHAT_ATTEMPT_TIMEOUT') or 30),
+            connect_timeout=float(os.environ.get('EDUCARE_CHAT_CONNECT_TIMEOUT') or 5),
+            deadline=float(os.environ.get('EDUCARE_CHAT_DEADLINE') or 30),
+            pool_size=int(os.environ.get('EDUCARE_CHAT_POOL_SIZE') or 10),
+            breaker=CircuitBreaker(
+                failure_threshold=int(os.environ.get('EDUCARE_CHAT_BREAKER_FAILURES') or 5),
+                reset_timeout=float(os.environ.get('EDUCARE_CHAT_BREAKER_RESET') or 30),
+            ),
+        )
+
+    @property
+    def session(self):
+        pid = os.getpid()
+        if self._session is None or self._session_pid != pid:
+            with self._lock:
+                if self._session is None or self._session_pid != pid:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    s = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self.pool_size, max_retries=0)
+                    s.mount('https://', adapter)
+                    s.mount('http://', adapter)
+                    self._session = s
+                    self._session_pid = pid
+        return self._session
+
+    def preferred_variant(self, model: str) -> Optional[str]:
+        return self._preferred.get(model)
+
+    def _variant_order(self, model: str) -> List[str]:
+        pref = self._preferred.get(model)
+        if pref in VARIANTS:
+            return [pref] + [v for v in VARIANTS if v != pref]
+        return list(VARIANTS)
+
+    def _build_request(self, variant: str, model: str, api_key: str, payload: Dict) -> Tuple[str, Dict, Dict]:
+        headers = {'Content-Type': 'application/json'}
+        if variant == 'query_key':
+            return f'{self.base_url}/v1beta2/{model}:generate?key={api_key}', headers, payload
+        if variant == 'auth_header':
+            return f'{self.base_url}/v1beta2/{model}:generate', {**headers, 'Authorization': f'Bearer {api_key}'}, payload
+        body = {
+            'model': model,
+            'prompt': payload.get('prompt'),
+            'temperature': payload.get('temperature'),
+            'maxOutputTokens': payload.get('maxOutputTokens'),
+        }
+        return f'{self.base_url}/v1/models:generate', {**headers, 'Authorization': f'Bearer {api_key}'}, body
+
+    def generate(self, model: str, api_key: str, payload: Dict, deadline: Optional[float] = None) -> ProviderResult:
+        """Call the provider, trying the remembered variant first, within one overall deadline.
+
+        `deadline` is a budget in seconds for all attempts together; it defaults
+        to the client's configured deadline. The outcome is reported to the
+        circuit breaker.
+        """
+        result = self._generate(model, api_key, payload, deadline)
+        self._record(result)
+        return result
+
+    def _record(self, result: 'ProviderResult') -> None:
+        if result.ok:
+            self.breaker.record_success()
+        elif _is_outage(result):
+            self.breaker.record_failure()
+
+    def _generate(self, model: str, api_key: str, payload: Dict, deadline: Optional[float] = None) -> ProviderResult:
+        budget = self.deadline if deadline is None else max(0.0, float(deadline))
+        start = time.monotonic()
+        result = ProviderResult()
+        for variant in self._variant_order(model):
+            remaining = budget - (time.monotonic() - start)
+            if remaining <= 0:
+                result.errors.append({'attempt': variant, 'exception': 'deadline exceeded'})
+                break
+            url, headers, body = self._build_request(variant, model, api_key, payload)
+            read_timeout = min(self.attempt_timeout, remaining)
+            try:
+                resp = self.session.post(url, headers=headers, json=body,
+                                         timeout=(min(self.connect_timeout, read_timeout), read_timeout))
+            except Exception as e:
+                result.errors.append({'attempt': variant, 'exception': str(e)})
+                continue
+            result.status_code = resp.status_code
+            result.text = resp.text
+            result.variant = variant
+            try:
+                result.raw = resp.json()
+            except Exception:
+                result.raw = {'status_code': resp.status_code, 'text': resp.text}
+            if resp.status_code == 200:
+                if self._preferred.get(model) != variant:
+                    LOG.info('Provider variant %s works for %s; using it first from now on', variant, model)
+                    self._preferred[model] = variant
+                break
+            result.errors.append({'attempt': variant, 'status': resp.status_code, 'text': resp.text})
+        result.elapsed = time.monotonic() - start
+        return result
+
+    def generate_stream(self, model: str, api_key: str, payload: Dict, deadline: Optional[float] = None) -> Iterator[Dict]:
+        """Yield {'delta': text} items as the provider produces them.
+
+        On failure a final {'error': ..., 'status': ..., 'detail': [...]} item is
+        yielded instead. The fallback path additionally carries 'raw' on its
+        single delta. All attempts share one deadline, as in `generate()`.
+        """
+        budget = self.deadline if deadline is None else max(0.0, float(deadline))
+        start = time.monotonic()
+        errors = []
+        if self._stream_ok.get(model) is not False:
+            url = f'{self.base_url}/v1beta/{model}:streamGenerateContent?alt=sse&key={api_key}'
+            body = {
+                'contents': [{'parts': [{'text': (payload.get('prompt') or {}).get('text', '')}]}],
+                'generationConfig': {
+                    'temperature': payload.get('temperature'),
+                    'maxOutputTokens': payload.get('maxOutputTokens'),
+                },
+            }
+            read_timeout = min(self.attempt_timeout, budget)
+            resp = None
+            try:
+                resp = self.session.post(url, headers={'Content-Type': 'application/json'}, json=body, stream=True,
+                                         timeout=(min(self.connect_timeout, read_timeout), read_timeout))
+            except Exception as e:
+                errors.append({'attempt': 'stream_sse', 'exception': str(e)})
+            if resp is not None and resp.status_code == 200:
+                self._stream_ok[model] = True
+                outcome = None  # stays None when the consumer closes the stream before it finished
+                try:
+                    # chunk_size=None hands over data as soon as it arrives instead of
+                    # waiting to fill a 512-byte buffer
+                    for line in resp.iter_lines(chunk_size=None, decode_unicode=True):
+                        if time.monotonic() - start > budget:
+                            outcome = 'failure'
+                            yield {'error': 'Provider stream exceeded deadline', 'status': 504, 'detail': errors}
+                            return
+                        if not line or not line.startswith('data:'):
+                            continue
+                        try:
+                            chunk = json.loads(line[5:].strip())
+                        except Exception:
+                            continue
+                        text = extract_reply(chunk)
+                        if text:
+                            yield {'delta': text}
+                    outcome = 'success'
+                except Exception as e:
+                    outcome = 'failure'
+                    errors.append({'attempt': 'stream_sse', 'exception': str(e)})
+                    yield {'error': 'Provider stream interrupted', 'status': 502, 'detail': errors}
+                finally:
+                    # GeneratorExit (client disconnected) and other BaseExceptions say nothing about the provider
+                    resp.close()
+                    if outcome == 'failure':
+                        self.breaker.record_failure()
+                    elif outcome == 'success':
+                        self.breaker.record_success()
+                    else:
+                        self.breaker.abandon()
+                return
+            if resp is not None:
+                if resp.status_code in (400, 404, 405, 501):
+                    # endpoint/model does not support streaming; stop trying it
+                    LOG.info('Provider streaming unavailable for %s (status %s); using generate()', model, resp.status_code)
+                    self._stream_ok[model] = False
+                errors.append({'attempt': 'stream_sse', 'status': resp.status_code, 'text': resp.text})
+                resp.close()
+
+        result = self._generate(model, api_key, payload, deadline=budget - (time.monotonic() - start))
+        self._record(result)
+        if result.ok:
+            yield {'delta': extract_reply(result.raw) or '', 'raw': result.raw}
+        else:
+            yield {'error': 'Failed to call provider', 'status': result.status_code or 502,
+                   'detail': errors + result.errors}
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> ProviderClient:
+    """Return the process-wide provider client, creating it from the environment on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ProviderClient.from_env()
+    return _client
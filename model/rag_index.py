@@ -0,0 +1,210 @@
+"""Passage-level BM25 retrieval over project documents for the /chat endpoint.
+
+Documents are split into overlapping character chunks, tokenized, and stored in
+an inverted index (term -> [[chunk_id, term_frequency], ...]). Queries are
+scored with Okapi BM25 and only the best passages are returned, so the prompt
+carries the relevant part of a large file instead of its first few thousand
+characters.
+
+The index is persisted as JSON together with a signature of its source
+documents; workers load it on startup and only rebuild when a source changed.
+Only the standard library is used so the module is cheap to import.
+"""
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+LOG = logging.getLogger('educare_api')
+
+INDEX_VERSION = 1
+DEFAULT_CHUNK_SIZE = 800
+DEFAULT_CHUNK_OVERLAP = 200
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+_SCRIPT_STYLE_RE = re.compile(r'<(script|style)\b[^>]*>.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+_TAG_RE = re.compile(r'<[^>]+>')
+_WS_RE = re.compile(r'[ \t\r\f\v]+')
+_BLANK_LINES_RE = re.compile(r'\n\s*\n+')
+
+# Small English stop list; enough to keep filler words out of the postings.
+STOP_WORDS = frozenset("""
+a an and are as at be but by for from has have he her his i if in into is it its
+me my no not of on or our she so than that the their them then there these they
+this to was we were what when where which who will with you your can do does how
+""".split())
+
+
+def html_to_text(html: str) -> str:
+    """Strip scripts, styles and tags from an HTML document, keeping visible text."""
+    txt = _SCRIPT_STYLE_RE.sub(' ', html)
+    txt = _TAG_RE.sub(' ', txt)
+    txt = _WS_RE.sub(' ', txt)
+    return _BLANK_LINES_RE.sub('\n', txt).strip()
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if len(t) > 1 and t not in STOP_WORDS]
+
+
+def chunk_text(text: str, size: int = DEFAULT_CHUNK_SIZE, overlap: int = DEFAULT_CHUNK_OVERLAP) -> List[Tuple[int, str]]:
+    """Split text into overlapping windows of roughly `size` characters.
+
+    Window edges are moved to the nearest whitespace so words are not cut in
+    half. Returns a list of (start_offset, chunk_text) tuples.
+    """
+    if not text:
+        return []
+    size = max(1, int(size))
+    overlap = max(0, min(int(overlap), size - 1))
+    out = []
+    n = len(text)
+    start = 0
+    while start < n:
+        end = min(n, start + size)
+        if end < n:
+            ws = text.rfind(' ', start + size // 2, end)
+            nl = text.rfind('\n', start + size // 2, end)
+            cut = max(ws, nl)
+            if cut > start:
+                end = cut
+        piece = text[start:end].strip()
+        if piece:
+            out.append((start, piece))
+        if end >= n:
+            break
+        nxt = end - overlap
+        if nxt > start:
+            # begin the next window on a word boundary inside the overlap
+            ws = text.find(' ', nxt, end)
+            nxt = ws + 1 if ws != -1 else nxt
+        start = max(nxt, start + 1)
+    return out
+
+
+def documents_signature(docs: Iterable[Tuple[str, str]]) -> str:
+    h = hashlib.sha1()
+    for source, text in docs:
+        h.update(source.encode('utf-8', 'replace'))
+        h.update(b'\0')
+        h.update(text.encode('utf-8', 'replace'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+class BM25Index:
+    """Inverted index over document chunks scored with Okapi BM25."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.signature = None
+        self.chunks: List[Dict] = []
+        self.doc_lens: List[int] = []
+        self.postings: Dict[str, List[List[int]]] = {}
+        self.avgdl = 0.0
+        self._idf: Dict[str, float] = {}
+
+    @classmethod
+    def build(cls, docs: Iterable[Tuple[str, str]], chunk_size: int = DEFAULT_CHUNK_SIZE,
+              overlap: int = DEFAULT_CHUNK_OVERLAP, signature: Optional[str] = None, **kwargs) -> 'BM25Index':
+        idx = cls(**kwargs)
+        idx.signature = signature
+        for source, text in docs:
+            for start, piece in chunk_text(text, chunk_size, overlap):
+                tokens = tokenize(piece)
+                if not tokens:
+                    continue
+                cid = len(idx.chunks)
+                idx.chunks.append({'source': source, 'start': start, 'text': piece})
+                idx.doc_lens.append(len(tokens))
+                tf: Dict[str, int] = {}
+                for t in tokens:
+                    tf[t] = tf.get(t, 0) + 1
+                for t, c in tf.items():
+                    idx.postings.setdefault(t, []).append([cid, c])
+        idx._finalize()
+        return idx
+
+    def _finalize(self):
+        n = len(self.doc_lens)
+        self.avgdl = (sum(self.doc_lens) / n) if n else 0.0
+        self._idf = {t: math.log(1.0 + (n - len(p) + 0.5) / (len(p) + 0.5)) for t, p in self.postings.items()}
+
+    def search(self, query: str, k: int = 4) -> List[Dict]:
+        """Return the top-k chunks for `query` as dicts with source, text, start and score."""
+        if not self.chunks or k <= 0:
+            return []
+        scores: Dict[int, float] = {}
+        k1, b, avgdl, lens = self.k1, self.b, (self.avgdl or 1.0), self.doc_lens
+        for t in set(tokenize(query)):
+            plist = self.postings.get(t)
+            if not plist:
+                continue
+            idf = self._idf[t]
+            for cid, tf in plist:
+                denom = tf + k1 * (1.0 - b + b * lens[cid] / avgdl)
+                scores[cid] = scores.get(cid, 0.0) + idf * tf * (k1 + 1.0) / denom
+        if not scores:
+            return []
+        best = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:k]
+        return [{**self.chunks[cid], 'chunk': cid, 'score': round(s, 4)} for cid, s in best]
+
+    def to_dict(self) -> Dict:
+        return {
+            'version': INDEX_VERSION,
+            'signature': self.signature,
+            'k1': self.k1,
+            'b': self.b,
+            'chunks': self.chunks,
+            'doc_lens': self.doc_lens,
+            'postings': self.postings,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'BM25Index':
+        if data.get('version') != INDEX_VERSION:
+            raise ValueError('Unsupported RAG index version: %r' % data.get('version'))
+        idx = cls(k1=float(data.get('k1', 1.5)), b=float(data.get('b', 0.75)))
+        idx.signature = data.get('signature')
+        idx.chunks = data.get('chunks') or []
+        idx.doc_lens = data.get('doc_lens') or []
+        idx.postings = data.get('postings') or {}
+        idx._finalize()
+        return idx
+
+    def save(self, path: Path) -> None:
+        """Write the index atomically so concurrent workers never read a partial file."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+        tmp.write_text(json.dumps(self.to_dict(), ensure_ascii=False, separators=(',', ':')), encoding='utf-8')
+        os.replace(str(tmp), str(path))
+
+    @classmethod
+    def load(cls, path: Path) -> 'BM25Index':
+        return cls.from_dict(json.loads(Path(path).read_text(encoding='utf-8')))
+
+
+def load_or_build(docs: List[Tuple[str, str]], path: Path, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                  overlap: int = DEFAULT_CHUNK_OVERLAP) -> BM25Index:
+    """Load the persisted index when it matches `docs`, otherwise rebuild and persist it."""
+    sig = f'{documents_signature(docs)}:{int(chunk_size)}:{int(overlap)}'
+    path = Path(path)
+    if path.exists():
+        try:
+            idx = BM25Index.load(path)
+            if idx.signature == sig:
+                return idx
+        except Exception as e:
+            LOG.warning('Ignoring unreadable RAG index %s: %s', path, e)
+    idx = BM25Index.build(docs, chunk_size=chunk_size, overlap=overlap, signature=sig)
+    try:
+        idx.save(path)
+    except Exception as e:
+        LOG.warning('Failed to persist RAG index to %s: %s', path, e)
+    return idx
@@ -0,0 +1,203 @@
+"""Request body decoding: compressed bodies and the binary feature-matrix format.
+
+Compressed bodies
+    `DecodingMiddleware` wraps the WSGI app. A request with
+    `Content-Encoding: gzip` (or `x-gzip`) or `deflate` (zlib or raw) is
+    inflated before Flask sees it, so `request.get_json()` and every route work
+    unchanged. Limits: the encoded body may be at most EDUCARE_MAX_BODY_MB
+    (default 50, matching nginx's client_max_body_size) and inflates to at most
+    EDUCARE_MAX_DECODED_MB (default 200). Inflation is incremental and stops at
+    the limit, so a decompression bomb costs no more than the limit. Errors are
+    answered as JSON: 413 over a limit, 400 corrupt data, 415 other encodings.
+
+Binary feature matrix (Content-Type: application/x-educare-matrix)
+    A 16-byte little-endian header followed by row-major float32 values:
+
+        offset  size  field
+        0       4     magic b'EDUM'
+        4       2     version (1)
+        6       2     flags (bit 0: the last column is a label)
+        8       4     rows
+        12      4     columns
+
+    Feature columns are in the model's feature order (feature_columns.json,
+    currently Attendance, CGPA, Stress). A label column holds the model's
+    label codes, 0 = Low, 1 = Medium, 2 = High (LABEL_CODES); anything else,
+    NaN included, is rejected with 400. `read_matrix()` validates the header
+    and returns a read-only NumPy view over the request bytes (no copy, no
+    per-row dicts), which /predict, /upload and /train feed to the model
+    directly.
+"""
+import io
+import json
+import os
+import struct
+import zlib
+from typing import Optional, Tuple
+
+MATRIX_CONTENT_TYPE = 'application/x-educare-matrix'
+MATRIX_MAGIC = b'EDUM'
+MATRIX_VERSION = 1
+FLAG_LABEL = 0x1
+# label column value -> label; the same encoding as label_map in feature_columns.json
+LABEL_CODES = ('Low', 'Medium', 'High')
+_HEADER = struct.Struct('<4sHHII')
+HEADER_SIZE = _HEADER.size
+
+MAX_BODY_BYTES = int(float(os.environ.get('EDUCARE_MAX_BODY_MB', '50')) * 1024 * 1024)
+MAX_DECODED_BYTES = int(float(os.environ.get('EDUCARE_MAX_DECODED_MB', '200')) * 1024 * 1024)
+_CHUNK = 64 * 1024
+
+
+class BodyError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _zlib_wbits(encoding: str, first: bytes) -> int:
+    if encoding in ('gzip', 'x-gzip'):
+        return 16 + zlib.MAX_WBITS
+    # "deflate" is zlib-wrapped per RFC 9110, but some clients send raw deflate
+    if len(first) >= 2 and (first[0] & 0x0F) == 8 and ((first[0] << 8) | first[1]) % 31 == 0:
+        return zlib.MAX_WBITS
+    return -zlib.MAX_WBITS
+
+
+def inflate(stream, encoding: str, max_body: int = MAX_BODY_BYTES, max_decoded: int = MAX_DECODED_BYTES) -> bytes:
+    """Read and decode a compressed body from a file-like stream, enforcing both limits."""
+    out = bytearray()
+    d = None
+    read = 0
+    while True:
+        chunk = stream.read(_CHUNK)
+        if not chunk:
+            break
+        read += len(chunk)
+        if read > max_body:
+            raise BodyError(413, f'Compressed body exceeds {max_body} bytes')
+        if d is None:
+            d = zlib.decompressobj(_zlib_wbits(encoding, chunk))
+        try:
+            data = d.decompress(chunk, max_decoded - len(out) + 1)
+            while True:
+                out += data
+                if len(out) > max_decoded:
+                    raise BodyError(413, f'Decoded body exceeds {max_decoded} bytes')
+                if not d.unconsumed_tail:
+                    break
+                data = d.decompress(d.unconsumed_tail, max_decoded - len(out) + 1)
+        except zlib.error as e:
+            raise BodyError(400, f'Invalid {encoding} body: {e}')
+        if d.eof:
+            break
+    if d is not None:
+        try:
+            out += d.flush()
+        except zlib.error as e:
+            raise BodyError(400, f'Invalid {encoding} body: {e}')
+        if not d.eof:
+            raise BodyError(400, f'Truncated {encoding} body')
+        if len(out) > max_decoded:
+            raise BodyError(413, f'Decoded body exceeds {max_decoded} bytes')
+    return bytes(out)
+
+
+class DecodingMiddleware:
+    """WSGI middleware that transparently inflates gzip/deflate request bodies."""
+
+    ENCODINGS = ('gzip', 'x-gzip', 'deflate')
+
+    def __init__(self, app, max_body: int = MAX_BODY_BYTES, max_decoded: int = MAX_DECODED_BYTES):
+        self.app = app
+        self.max_body = max_body
+        self.max_decoded = max_decoded
+
+    def __call__(self, environ, start_response):
+        encoding = environ.get('HTTP_CONTENT_ENCODING', '').strip().lower()
+        if not encoding or encoding == 'identity':
+            return self.app(environ, start_response)
+        if encoding not in self.ENCODINGS:
+            return self._error(start_response, 415, f'Unsupported Content-Encoding: {encoding}')
+        try:
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        if length > self.max_body:
+            return self._error(start_response, 413, f'Compressed body exceeds {self.max_body} bytes')
+        # stops at Content-Length: the dev server's wsgi.input is the raw socket and never returns EOF
+        from werkzeug.wsgi import get_input_stream
+        try:
+            body = inflate(get_input_stream(environ), encoding, self.max_body, self.max_decoded)
+        except BodyError as e:
+            return self._error(start_response, e.status, str(e))
+        environ['wsgi.input'] = io.BytesIO(body)
+        environ['CONTENT_LENGTH'] = str(len(body))
+        environ.pop('HTTP_CONTENT_ENCODING', None)
+        environ['educare.encoded_length'] = length
+        return self.app(environ, start_response)
+
+    @staticmethod
+    def _error(start_response, status: int, message: str):
+        reason = {400: 'BAD REQUEST', 413: 'REQUEST ENTITY TOO LARGE', 415: 'UNSUPPORTED MEDIA TYPE'}[status]
+        body = json.dumps({'error': message}).encode('utf-8')
+        start_response(f'{status} {reason}', [('Content-Type', 'application/json'),
+                                              ('Content-Length', str(len(body))),
+                                              ('Connection', 'close')])
+        return [body]
+
+
+def is_matrix(mimetype: Optional[str]) -> bool:
+    return (mimetype or '').lower() == MATRIX_CONTENT_TYPE
+
+
+def encode_matrix(X, labels=None) -> bytes:
+    """Build a matrix body (used by clients and the benchmarks); labels are LABEL_CODES indices."""
+    import numpy as np
+    X = np.asarray(X, dtype='<f4')
+    flags = 0
+    if labels is not None:
+        X = np.column_stack([X, np.asarray(labels, dtype='<f4')]).astype('<f4')
+        flags |= FLAG_LABEL
+    rows, cols = X.shape
+    return _HEADER.pack(MATRIX_MAGIC, MATRIX_VERSION, flags, rows, cols) + np.ascontiguousarray(X).tobytes()
+
+
+def read_matrix(body: bytes, n_features: int, want_label: bool = False) -> Tuple:
+    """Decode a matrix body into (X, labels) NumPy views over `body` (labels None without the label flag).
+
+    Raises BodyError(400) for a malformed header, a shape that does not match
+    the model's features, or (with want_label) a label that is not a LABEL_CODES index.
+    """
+    import numpy as np
+    if len(body) < HEADER_SIZE:
+        raise BodyError(400, 'Matrix body shorter than its 16-byte header')
+    magic, version, flags, rows, cols = _HEADER.unpack_from(body)
+    if magic != MATRIX_MAGIC or version != MATRIX_VERSION:
+        raise BodyError(400, f'Not an EDUM v{MATRIX_VERSION} matrix')
+    has_label = bool(flags & FLAG_LABEL)
+    expected = n_features + (1 if has_label else 0)
+    if cols != expected:
+        raise BodyError(400, f'Matrix has {cols} columns; expected {expected} '
+                             f'({n_features} features{" + label" if has_label else ""})')
+    if want_label and not has_label:
+        raise BodyError(400, 'Matrix has no label column (set flag bit 0 and append labels as the last column)')
+    if len(body) != HEADER_SIZE + rows * cols * 4:
+        raise BodyError(400, f'Matrix body is {len(body)} bytes; header declares {rows}x{cols} float32 values')
+    M = np.frombuffer(body, dtype='<f4', count=rows * cols, offset=HEADER_SIZE).reshape(rows, cols)
+    if has_label:
+        labels = M[:, n_features]
+        if want_label:
+            bad = ~np.isin(labels, np.arange(len(LABEL_CODES), dtype='<f4'))
+            if bad.any():
+                i = int(np.argmax(bad))
+                codes = ', '.join(f'{c} ({name})' for c, name in enumerate(LABEL_CODES))
+                raise BodyError(400, f'Matrix label column must hold one of {codes}; '
+                                     f'{int(bad.sum())} row(s) do not, first row {i} has {float(labels[i])}')
+        return M[:, :n_features], labels
+    return M, None
+
+
+def matrix_rows(X, features):
+    """Row dicts for a matrix (only built when rows must be echoed or saved)."""
+    return [dict(zip(features, r)) for r in X.tolist()]
@@ -0,0 +1,162 @@
+"""In-memory manifest of the portal's static files.
+
+The manifest is built once when the server starts: every servable file under
+the project root is read, hashed (strong ETag) and, for text-like types,
+compressed to gzip and (when the optional `brotli` package is installed)
+brotli variants. Requests are then answered from memory: no stat or open
+syscalls, 304 for matching If-None-Match, and the smallest encoding the client
+accepts.
+"""
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+try:
+    import brotli
+    _HAS_BROTLI = True
+except Exception:
+    brotli = None
+    _HAS_BROTLI = False
+
+LOG = logging.getLogger('educare_api')
+
+# Top-level directories never served (server code, virtualenvs, caches).
+EXCLUDED_TOP = frozenset({'model', '.venv', 'venv', '__pycache__'})
+# Individual files never served (credentials).
+EXCLUDED_FILES = frozenset({'firebase/serviceAccountKey.json'})
+COMPRESSIBLE_PREFIXES = ('text/',)
+COMPRESSIBLE_TYPES = frozenset({'application/javascript', 'application/json', 'image/svg+xml',
+                                'application/xml', 'text/javascript'})
+MIN_COMPRESS_SIZE = 512
+MAX_FILE_SIZE = 5 * 1024 * 1024
+
+
+class Asset:
+    __slots__ = ('path', 'mimetype', 'etag', 'variants')
+
+    def __init__(self, path: str, mimetype: str, etag: str, variants: Dict[str, Tuple[bytes, str]]):
+        self.path = path
+        self.mimetype = mimetype
+        self.etag = etag
+        # encoding ('identity', 'gzip', 'br') -> (body, etag)
+        self.variants = variants
+
+    def etags(self) -> Iterable[str]:
+        return (e for _, e in self.variants.values())
+
+    def select(self, accept_encoding: str) -> Tuple[str, bytes, str]:
+        """Return (encoding, body, etag) for the best variant the client accepts."""
+        ae = (accept_encoding or '').lower()
+        for enc in ('br', 'gzip'):
+            if enc in self.variants and _accepts(ae, enc):
+                body, etag = self.variants[enc]
+                return enc, body, etag
+        body, etag = self.variants['identity']
+        return 'identity', body, etag
+
+
+def _accepts(accept_encoding: str, enc: str) -> bool:
+    for part in accept_encoding.split(','):
+        token, _, params = part.strip().partition(';')
+        if token.strip() != enc:
+            continue
+        q = params.strip()
+        return not (q.startswith('q=') and q[2:].strip() in ('0', '0.0', '0.00', '0.000'))
+    return False
+
+
+def _compressible(mimetype: str) -> bool:
+    return mimetype.startswith(COMPRESSIBLE_PREFIXES) or mimetype in COMPRESSIBLE_TYPES
+
+
+def _servable(rel: str) -> bool:
+    parts = rel.split('/')
+    if parts[0] in EXCLUDED_TOP or rel in EXCLUDED_FILES:
+        return False
+    # hidden files and directories (.git, .vscode, ...)
+    return not any(p.startswith('.') for p in parts)
+
+
+class StaticManifest:
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.assets: Dict[str, Asset] = {}
+        self.bytes_identity = 0
+        self.bytes_compressed = 0
+
+    @classmethod
+    def build(cls, root: Path) -> 'StaticManifest':
+        m = cls(root)
+        root = m.root
+        for dirpath, dirnames, filenames in os.walk(root):
+            rel_dir = Path(dirpath).relative_to(root).as_posix()
+            rel_dir = '' if rel_dir == '.' else rel_dir
+            # prune excluded directories early
+            dirnames[:] = [d for d in dirnames if _servable(f'{rel_dir}/{d}' if rel_dir else d)]
+            for name in filenames:
+                rel = f'{rel_dir}/{name}' if rel_dir else name
+                if not _servable(rel):
+                    continue
+                try:
+                    m._add(rel, Path(dirpath) / name)
+                except Exception as e:
+                    LOG.warning('Static manifest skipped %s: %s', rel, e)
+        # directories containing an index.html are served as that file
+        for rel in list(m.assets):
+            if rel.endswith('/index.html'):
+                d = rel[:-len('/index.html')]
+                m.assets.setdefault(d, m.assets[rel])
+                m.assets.setdefault(d + '/', m.assets[rel])
+        return m
+
+    def _add(self, rel: str, path: Path) -> None:
+        if path.stat().st_size > MAX_FILE_SIZE:
+            return
+        data = path.read_bytes()
+        mimetype = mimetypes.guess_type(rel)[0] or 'application/octet-stream'
+        digest = hashlib.sha256(data).hexdigest()[:32]
+        variants = {'identity': (data, f'"{digest}"')}
+        self.bytes_identity += len(data)
+        if _compressible(mimetype) and len(data) >= MIN_COMPRESS_SIZE:
+            gz = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(gz) < len(data):
+                variants['gzip'] = (gz, f'"{digest}-gz"')
+            if _HAS_BROTLI:
+                br = brotli.compress(data, quality=11)
+                if len(br) < len(data):
+                    variants['br'] = (br, f'"{digest}-br"')
+        self.bytes_compressed += min(len(v[0]) for v in variants.values())
+        self.assets[rel] = Asset(rel, mimetype, variants['identity'][1], variants)
+
+    def get(self, rel: str) -> Optional[Asset]:
+        return self.assets.get(rel)
+
+    def stats(self) -> Dict:
+        files = {id(a) for a in self.assets.values()}
+        return {
+            'files': len(files),
+            'bytes_identity': self.bytes_identity,
+            'bytes_smallest': self.bytes_compressed,
+            'brotli': _HAS_BROTLI,
+        }
+
+
+def if_none_match(header: Optional[str], asset: Asset) -> bool:
+    """True when an If-None-Match header matches any variant of `asset`."""
+    if not header:
+        return False
+    header = header.strip()
+    if header == '*':
+        return True
+    known = set(asset.etags())
+    for tag in header.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag in known:
+            return True
+    return False
@@ -0,0 +1,112 @@
+"""Chunked reading of uploaded CSV/XLSX tables.
+
+`iter_chunks()` yields DataFrames of at most `chunk_rows` rows from an
+uploaded file, so scoring a spreadsheet needs memory proportional to the chunk
+rather than the file:
+
+ - CSV is read with pandas' chunked reader straight from the upload stream
+   (a UTF-8 BOM, as written by Excel, is accepted).
+ - XLSX is read with openpyxl in read-only mode, which streams rows from the
+   worksheet XML; the first non-empty row is the header.
+ - Legacy .xls has no streaming reader; it is loaded with pandas and then
+   sliced into chunks.
+
+The layout is the one train_model.py's load_data() accepts (e.g. Name,
+Attendance, CGPA, Stress; column names are matched case-insensitively later).
+"""
+from typing import IO, Iterator, Optional
+
+CSV_EXTENSIONS = ('.csv', '.txt')
+XLSX_EXTENSIONS = ('.xlsx', '.xlsm')
+XLS_EXTENSIONS = ('.xls',)
+_ZIP_MAGIC = b'PK\x03\x04'
+_OLE_MAGIC = b'\xd0\xcf\x11\xe0'
+
+
+class TableError(ValueError):
+    pass
+
+
+def detect_kind(filename: Optional[str], head: bytes) -> str:
+    """'csv', 'xlsx' or 'xls' from the file name, falling back to the leading bytes."""
+    name = (filename or '').lower()
+    if name.endswith(XLSX_EXTENSIONS):
+        return 'xlsx'
+    if name.endswith(XLS_EXTENSIONS):
+        return 'xls'
+    if name.endswith(CSV_EXTENSIONS):
+        return 'csv'
+    if head.startswith(_ZIP_MAGIC):
+        return 'xlsx'
+    if head.startswith(_OLE_MAGIC):
+        return 'xls'
+    return 'csv'
+
+
+def _peek(stream: IO[bytes], n: int = 8) -> bytes:
+    pos = stream.tell()
+    head = stream.read(n)
+    stream.seek(pos)
+    return head
+
+
+def _csv_chunks(stream, chunk_rows: int):
+    import pandas as pd
+    try:
+        reader = pd.read_csv(stream, chunksize=chunk_rows, encoding='utf-8-sig', skipinitialspace=True)
+        for chunk in reader:
+            yield chunk
+    except pd.errors.EmptyDataError:
+        return
+    except (pd.errors.ParserError, UnicodeDecodeError) as e:
+        raise TableError(f'Could not parse CSV: {e}')
+
+
+def _xlsx_chunks(stream, chunk_rows: int):
+    import pandas as pd
+    from openpyxl import load_workbook
+    try:
+        wb = load_workbook(stream, read_only=True, data_only=True)
+    except Exception as e:
+        raise TableError(f'Could not open XLSX workbook: {e}')
+    try:
+        ws = wb.worksheets[0]
+        header = None
+        buf = []
+        for values in ws.iter_rows(values_only=True):
+            if header is None:
+                if not any(v is not None and str(v).strip() for v in values):
+                    continue
+                header = [str(v).strip() if v is not None else f'column_{i}' for i, v in enumerate(values)]
+                continue
+            if not any(v is not None for v in values):
+                continue
+            buf.append(values[:len(header)])
+            if len(buf) >= chunk_rows:
+                yield pd.DataFrame(buf, columns=header)
+                buf = []
+        if buf:
+            yield pd.DataFrame(buf, columns=header)
+    finally:
+        wb.close()
+
+
+def _xls_chunks(stream, chunk_rows: int):
+    import pandas as pd
+    try:
+        df = pd.read_excel(stream)
+    except Exception as e:
+        raise TableError(f'Could not read XLS workbook: {e}')
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def iter_chunks(stream: IO[bytes], filename: Optional[str] = None, chunk_rows: int = 5000) -> Iterator:
+    """Yield DataFrames of at most chunk_rows rows from an uploaded CSV/XLSX/XLS file."""
+    chunk_rows = max(1, int(chunk_rows))
+    kind = detect_kind(filename, _peek(stream))
+    if kind == 'xlsx':
+        return _xlsx_chunks(stream, chunk_rows)
+    if kind == 'xls':
+        return _xls_chunks(stream, chunk_rows)
+    return _csv_chunks(stream, chunk_rows)
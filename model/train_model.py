@@ -6,10 +6,19 @@ Expect input CSV/XLSX with at least these columns:
  - Stress (numeric)
  - Risk (target: Low, Medium, High)
 
+--input may also be a snapshot directory written by scripts/export_firestore.py
+(manifest.json + one CSV per collection); its tables are concatenated and rows
+without a Risk label are skipped.
+
 Usage:
  python train_model.py --input data.csv --output-dir ./joblib_model
+ python train_model.py --input ../model/firestore_snapshot --output-dir ./model_job
 
 This writes model.joblib and feature_columns.json to the output directory.
+
+--max-latency-ms / --max-size-kb shrink the forest to that budget afterwards
+(see forest_budget.py), judged on the test split; the trade-off is printed
+and recorded under `pruning` in feature_columns.json.
 """
 import argparse
 import json
@@ -22,12 +31,29 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report
 import joblib
 
+import forest_budget
+
 
 LABEL_MAP = {"Low": 0, "Medium": 1, "High": 2}
 INV_LABEL_MAP = {v: k for k, v in LABEL_MAP.items()}
 
 
+def load_snapshot(path: Path) -> pd.DataFrame:
+    manifest = json.loads((path / 'manifest.json').read_text(encoding='utf-8'))
+    frames = []
+    for name, info in manifest.get('collections', {}).items():
+        table = path / info.get('file', f'{name}.csv')
+        if table.exists():
+            frames.append(pd.read_csv(table))
+    if not frames:
+        raise ValueError(f"Snapshot '{path}' contains no tables")
+    df = pd.concat(frames, ignore_index=True)
+    return df[df['risk'].notna()] if 'risk' in df.columns else df
+
+
 def load_data(path: Path) -> pd.DataFrame:
+    if path.is_dir():
+        return load_snapshot(path)
     if path.suffix in (".xls", ".xlsx"):
         df = pd.read_excel(path)
     else:
@@ -87,6 +113,18 @@ def train(args):
     y_pred = clf.predict(X_test)
     print(classification_report(y_test, y_pred, target_names=["Low","Medium","High"]))
 
+    budget = forest_budget.Budget(max_latency_ms=args.max_latency_ms, max_size_kb=args.max_size_kb,
+                                  min_agreement=args.min_agreement)
+    clf, pruning = forest_budget.fit_budget(clf, X_test, y_test, budget)
+    if pruning is not None and 'selected' in pruning:
+        orig, sel = pruning['original'], pruning['selected']
+        print(f"Pruned forest: {orig['n_estimators']} -> {sel['n_estimators']} trees, "
+              f"max_depth {orig['max_depth']} -> {sel['max_depth']}, "
+              f"{orig['size_kb']:.0f} -> {sel['size_kb']:.0f} KB, "
+              f"{orig['latency_ms']:.1f} -> {sel['latency_ms']:.1f} ms per {budget.latency_rows} rows; "
+              f"agreement {sel['agreement']:.3f}, accuracy {orig['accuracy']:.3f} -> {sel['accuracy']:.3f}"
+              + ("" if pruning['budget_met'] else " (budget not met)"))
+
     model_path = out / 'model.joblib'
     joblib.dump(clf, model_path)
     print(f"Saved model to {model_path}")
@@ -96,15 +134,22 @@ def train(args):
         'label_map': LABEL_MAP,
         'inv_label_map': INV_LABEL_MAP
     }
+    if pruning is not None:
+        meta['pruning'] = pruning
     (out / 'feature_columns.json').write_text(json.dumps(meta, indent=2))
     print(f"Saved feature metadata to {out / 'feature_columns.json'}")
 
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument('--input', '-i', required=True, help='Input CSV/XLSX file with historical labeled data')
+    parser.add_argument('--input', '-i', required=True, help='Input CSV/XLSX file (or export_firestore.py snapshot directory) with historical labeled data')
     parser.add_argument('--output-dir', '-o', default='./model_job', help='Output directory to write trained model')
+    parser.add_argument('--max-latency-ms', type=float, help='Shrink the forest until predicting a 100-row batch takes at most this long')
+    parser.add_argument('--max-size-kb', type=float, help='Shrink the forest until the pickled model is at most this large')
+    parser.add_argument('--min-agreement', type=float, default=forest_budget.DEFAULT_MIN_AGREEMENT, help='Lowest share of test-split predictions a shrunk forest must share with the full one')
     args = parser.parse_args()
+    if not 0.0 <= args.min_agreement <= 1.0:
+        parser.error('--min-agreement must be between 0 and 1')
     train(args)
 
 
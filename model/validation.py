@@ -0,0 +1,197 @@
+"""Vectorized validation of prediction inputs.
+
+Every input cell of a model feature is checked with column-wise NumPy
+operations (no per-row Python) and the result is folded into one integer
+per row, the error mask; 0 means the row is valid. For feature number i (in
+the model's feature order) and error code c the flag is bit `i * 3 + c`:
+
+    code  name          meaning
+    0     missing       the column is absent or the cell is null
+    1     not_numeric   the cell cannot be read as a finite number
+    2     out_of_range  the value is outside the feature's allowed range
+
+so with Attendance, CGPA, Stress a row with a missing CGPA and a Stress of 42
+has mask (1 << 3) | (1 << 8) = 264. Responses carry the masks together with
+`fields` and `codes` so clients can decode them without this table.
+
+Allowed ranges come from EDUCARE_FEATURE_RANGES, as
+`feature=<min>:<max>` pairs (either bound may be left empty); the default
+matches the portal's input forms. Columns that are neither features nor
+known row fields (KNOWN_FIELDS) are reported as unknown but do not fail rows.
+"""
+import os
+from typing import Dict, List, Optional, Tuple
+
+CODES = ('missing', 'not_numeric', 'out_of_range')
+MISSING, NOT_NUMERIC, OUT_OF_RANGE = range(len(CODES))
+MAX_FEATURES = 63 // len(CODES)
+
+DEFAULT_RANGES = 'Attendance=0:100,CGPA=0:10,Stress=0:10'
+# Row fields the portal and the upload layouts send alongside the features, and the
+# /predict control keys (save, echo, format, explain) a single-object body carries.
+KNOWN_FIELDS = frozenset({'id', 'studentid', 'name', 'student name', 'email', 'parentname', 'parentemail',
+                          'risk', 'label', 'save', 'echo', 'format', 'explain'})
+
+
+def parse_ranges(spec: str) -> Dict[str, Tuple[Optional[float], Optional[float]]]:
+    """Parse 'Attendance=0:100,CGPA=0:10' into {'attendance': (0.0, 100.0), ...}."""
+    ranges = {}
+    for part in (spec or '').split(','):
+        if not part.strip():
+            continue
+        name, _, bounds = part.partition('=')
+        lo, _, hi = bounds.partition(':')
+        ranges[name.strip().lower()] = (float(lo) if lo.strip() else None, float(hi) if hi.strip() else None)
+    return ranges
+
+
+RANGES = parse_ranges(os.environ.get('EDUCARE_FEATURE_RANGES', DEFAULT_RANGES))
+
+
+def bit(feature_index: int, code: int) -> int:
+    return 1 << (feature_index * len(CODES) + code)
+
+
+def describe(mask: int, features) -> Dict[str, str]:
+    """{feature: code name} for one row's mask."""
+    out = {}
+    for i, f in enumerate(features):
+        for code, name in enumerate(CODES):
+            if mask & bit(i, code):
+                out[f] = name
+    return out
+
+
+def report(rows, masks, features) -> Dict:
+    """The `invalid` block of a response: row indices, their masks and per-feature counts."""
+    import numpy as np
+    masks = np.asarray(masks, dtype=np.int64)
+    summary = {}
+    for i, f in enumerate(features):
+        counts = {name: int(np.count_nonzero(masks & bit(i, code))) for code, name in enumerate(CODES)}
+        counts = {k: v for k, v in counts.items() if v}
+        if counts:
+            summary[f] = counts
+    return {'count': int(masks.size), 'rows': list(rows), 'mask': masks.tolist(),
+            'fields': list(features), 'codes': list(CODES), 'summary': summary}
+
+
+class Validation:
+    """Feature matrix for n input rows plus their error masks."""
+
+    def __init__(self, X, mask, features, matched, unknown_columns):
+        import numpy as np
+        self.X = X
+        self.mask = mask
+        self.features = list(features)
+        # feature -> input column it was read from (features absent from the input are missing)
+        self.matched = matched
+        self.unknown_columns = unknown_columns
+        self.valid = mask == 0
+        self.n = int(mask.size)
+        self.n_invalid = self.n - int(np.count_nonzero(self.valid))
+
+    @property
+    def all_valid(self) -> bool:
+        return self.n_invalid == 0
+
+    def invalid_index(self):
+        import numpy as np
+        return np.flatnonzero(~self.valid)
+
+    def good(self):
+        """Feature rows that passed validation (X itself when all did)."""
+        return self.X if self.all_valid else self.X[self.valid]
+
+    def scatter(self, values, fill=None) -> List:
+        """Place per-valid-row values back at their input positions, `fill` elsewhere."""
+        values = values.tolist() if hasattr(values, 'tolist') else list(values)
+        if self.all_valid:
+            return values
+        import numpy as np
+        out = [fill] * self.n
+        for i, v in zip(np.flatnonzero(self.valid).tolist(), values):
+            out[i] = v
+        return out
+
+    def errors(self) -> Dict[int, Dict[str, str]]:
+        """{row index: {feature: code name}} for the invalid rows only."""
+        idx = self.invalid_index()
+        return {i: describe(m, self.features) for i, m in zip(idx.tolist(), self.mask[idx].tolist())}
+
+    def report(self, offset: int = 0) -> Dict:
+        idx = self.invalid_index()
+        return report((idx + offset).tolist(), self.mask[idx], self.features)
+
+
+def _check_range(mask, values, j: int, feature: str, ranges) -> None:
+    import numpy as np
+    lo, hi = ranges.get(feature.lower(), (None, None))
+    if lo is None and hi is None:
+        return
+    # non-finite values are already flagged as missing/not_numeric
+    out = np.zeros(values.shape, dtype=bool)
+    if lo is not None:
+        out |= values < lo
+    if hi is not None:
+        out |= values > hi
+    mask |= (out & np.isfinite(values)) * bit(j, OUT_OF_RANGE)
+
+
+def validate_frame(df, features, ranges=None) -> Validation:
+    """Validate a DataFrame of input rows; feature columns are matched case-insensitively.
+
+    X is float64 with NaN in missing and non-numeric cells; nothing is filled in.
+    """
+    import numpy as np
+    import pandas as pd
+    if len(features) > MAX_FEATURES:
+        raise ValueError(f'At most {MAX_FEATURES} features can be validated')
+    ranges = RANGES if ranges is None else ranges
+    n = len(df)
+    # rows may spell a key differently ('CGPA' vs 'cgpa'); all spellings of a feature are merged
+    col_map = {}
+    for c in df.columns:
+        col_map.setdefault(str(c).strip().lower(), []).append(c)
+    X = np.empty((n, len(features)), dtype=np.float64)
+    mask = np.zeros(n, dtype=np.int64)
+    matched = {}
+    for j, f in enumerate(features):
+        cols = col_map.get(f.lower())
+        if not cols:
+            X[:, j] = np.nan
+            mask |= bit(j, MISSING)
+            continue
+        matched[f] = cols[0]
+        raw = df[cols[0]]
+        for other in cols[1:]:
+            raw = raw.combine_first(df[other])
+        if raw.dtype.kind in 'biuf':
+            values = raw.to_numpy(dtype=np.float64, na_value=np.nan)
+            missing = np.isnan(values)
+            bad = np.isinf(values)
+        else:
+            missing = raw.isna().to_numpy()
+            values = pd.to_numeric(raw, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+            bad = ~np.isfinite(values) & ~missing
+        X[:, j] = values
+        mask |= missing * bit(j, MISSING)
+        mask |= bad * bit(j, NOT_NUMERIC)
+        _check_range(mask, values, j, f, ranges)
+    known = {f.lower() for f in features} | KNOWN_FIELDS
+    unknown = [str(c) for c in df.columns if str(c).strip().lower() not in known]
+    return Validation(X, mask, features, matched, unknown)
+
+
+def validate_matrix(X, features, ranges=None) -> Validation:
+    """Validate a binary-matrix body (see request_codec.read_matrix); NaN counts as missing."""
+    import numpy as np
+    ranges = RANGES if ranges is None else ranges
+    mask = np.zeros(X.shape[0], dtype=np.int64)
+    for j, f in enumerate(features):
+        values = X[:, j]
+        missing = np.isnan(values)
+        mask |= missing * bit(j, MISSING)
+        mask |= np.isinf(values) * bit(j, NOT_NUMERIC)
+        _check_range(mask, values, j, f, ranges)
+    return Validation(X, mask, features, {f: f for f in features}, [])
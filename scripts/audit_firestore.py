@@ -0,0 +1,166 @@
+"""Audit Firestore collections: document counts and empty documents.
+
+Replaces list_empty_firestore.py / debug_list_empty.py. Uses the same
+emptiness rules as clean_empty_firestore.py (firestore_utils.doc_is_empty), so
+the audit reports exactly what a cleanup run would delete.
+
+ - Totals come from server-side count() aggregation (one round-trip per
+   collection, no documents transferred).
+ - The emptiness scan streams each collection page by page in parallel
+   key-range partitions; memory stays bounded by --page-size and --max-ids
+   regardless of collection size.
+ - --fields projects the scan to the given fields, so only those come back
+   (a document then counts as empty when none of them is meaningful).
+   --count-only skips the scan entirely.
+
+Usage (PowerShell):
+    python .\\scripts\\audit_firestore.py
+    python .\\scripts\\audit_firestore.py --count-only
+    python .\\scripts\\audit_firestore.py --collections students,parents --fields name,email --json
+    python .\\scripts\\audit_firestore.py --workers 8 --partitions 4 --output audit.json
+    python .\\scripts\\audit_firestore.py --fake 20000 --fake-latency 0.02
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from firestore_utils import (DEFAULT_COLLECTIONS, DEFAULT_SERVICE_ACCOUNT, Progress, connect, doc_is_empty,
+                             id_partitions, iter_pages, server_count)
+
+
+class CollectionStats:
+    def __init__(self, name: str, max_ids: int):
+        self.name = name
+        self.max_ids = max_ids
+        self.count = None
+        self.scanned = 0
+        self.empty = 0
+        self.empty_ids = []
+        self.started = None
+        self.finished = None
+        self.errors = []
+        self._lock = threading.Lock()
+
+    def add_page(self, scanned: int, empty_ids) -> None:
+        with self._lock:
+            self.scanned += scanned
+            self.empty += len(empty_ids)
+            room = self.max_ids - len(self.empty_ids)
+            if room > 0:
+                self.empty_ids.extend(empty_ids[:room])
+
+    def mark(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if self.started is None:
+                self.started = now
+            self.finished = now
+
+    def summary(self) -> dict:
+        elapsed = (self.finished - self.started) if self.started is not None else 0.0
+        out = {
+            'count': self.count,
+            'found': self.scanned,
+            'empty_count': self.empty,
+            'empty_ids': sorted(self.empty_ids),
+            'seconds': round(elapsed, 3),
+            'docs_per_sec': round(self.scanned / elapsed) if elapsed > 0 else None,
+        }
+        if self.errors:
+            out['errors'] = self.errors
+        return out
+
+
+def scan(db, stats: CollectionStats, start, end, page_size: int, fields, progress: Progress) -> None:
+    stats.mark()
+    for page in iter_pages(db, stats.name, page_size=page_size, fields=fields, start=start, end=end):
+        stats.add_page(len(page), [d.id for d in page if doc_is_empty(d.to_dict() or {})])
+        progress.add('docs', len(page))
+        stats.mark()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--service-account", default=DEFAULT_SERVICE_ACCOUNT, help="Path to service account JSON")
+    parser.add_argument("--project", default=None, help="Project id (emulator only)")
+    parser.add_argument("--collections", default=','.join(DEFAULT_COLLECTIONS),
+                        help="Comma-separated collection names to audit")
+    parser.add_argument("--fields", default="", help="Comma-separated fields to fetch and test (default: whole documents)")
+    parser.add_argument("--count-only", action="store_true", help="Only report server-side counts")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent scan tasks")
+    parser.add_argument("--partitions", type=int, default=1, help="Key-range partitions per collection")
+    parser.add_argument("--page-size", type=int, default=500, help="Documents fetched per query page")
+    parser.add_argument("--max-ids", type=int, default=50, help="Empty document ids listed per collection")
+    parser.add_argument("--progress-interval", type=float, default=5.0, help="Seconds between progress lines (0 = off)")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    parser.add_argument("--output", default="", help="Also write the JSON summary to this file")
+    parser.add_argument("--fake", type=int, default=0, help="Use an in-memory client seeded with N docs per collection")
+    parser.add_argument("--fake-latency", type=float, default=0.0, help="Simulated round-trip seconds for --fake")
+    args = parser.parse_args()
+
+    try:
+        db = connect(args.service_account, project=args.project, fake=args.fake, fake_latency=args.fake_latency)
+    except Exception as e:
+        print(f"Failed to initialize Firestore client with '{args.service_account}': {e}")
+        sys.exit(1)
+
+    cols = [c.strip() for c in args.collections.split(',') if c.strip()]
+    fields = [f.strip() for f in args.fields.split(',') if f.strip()] or None
+    stats = {col: CollectionStats(col, args.max_ids) for col in cols}
+    progress = Progress(args.progress_interval, label='docs')
+    started = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        counts = {pool.submit(server_count, db, col): col for col in cols}
+        for fut in as_completed(counts):
+            stats[counts[fut]].count = fut.result()
+        if not args.count_only:
+            progress.start()
+
+            futures = {pool.submit(scan, db, stats[col], s, e, args.page_size, fields, progress): col
+                       for col in cols for s, e in id_partitions(args.partitions)}
+            for fut in as_completed(futures):
+                try:
+                    fut.result()
+                except Exception as e:
+                    col = futures[fut]
+                    stats[col].errors.append(str(e))
+                    print(f"  Failed to scan {col}: {e}")
+            progress.stop()
+    elapsed = time.monotonic() - started
+
+    summary = {col: s.summary() for col, s in stats.items()}
+    if args.count_only:
+        summary = {col: {'count': s['count']} for col, s in summary.items()}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+
+    if args.count_only:
+        print(f"{'collection':<18} {'count':>9}")
+    else:
+        print(f"{'collection':<18} {'count':>9} {'scanned':>9} {'empty':>7} {'docs/s':>8}")
+    for col, s in summary.items():
+        count = '?' if s['count'] is None else s['count']
+        if args.count_only:
+            print(f"{col:<18} {count:>9}")
+            continue
+        rate = '-' if s['docs_per_sec'] is None else s['docs_per_sec']
+        print(f"{col:<18} {count:>9} {s['found']:>9} {s['empty_count']:>7} {rate:>8}")
+    total = sum(s.get('found', 0) for s in summary.values())
+    print(f"\nAudited {len(cols)} collection(s) in {elapsed:.1f}s"
+          + ('' if args.count_only else f"; scanned {total} documents ({total / max(elapsed, 1e-9):.0f} docs/s)"))
+    if not args.count_only:
+        for col, s in summary.items():
+            if s['empty_ids']:
+                print(f"  {col}: {', '.join(s['empty_ids'][:10])}{' ...' if s['empty_count'] > 10 else ''}")
+
+
+if __name__ == '__main__':
+    main()
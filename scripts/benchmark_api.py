@@ -0,0 +1,340 @@
+"""Benchmark the EduCare API hot paths and compare against a stored baseline.
+
+Covers:
+ - prepare_input() and model predict/predict_proba at several batch sizes
+ - /predict (row and columnar response formats, JSON and binary matrix input) and /upload
+   through the Flask test client
+ - response encoding: stdlib json (Flask's previous default) vs the app's
+   JSON encoder, for row and columnar /predict bodies, with encoded bytes
+ - /train at several dataset sizes (into a temporary model directory, so the
+   real model_job/ is never touched)
+ - BM25 retrieval over the project documents
+ - /chat against the local stub provider (scripts/stub_provider.py)
+
+Every benchmark reports throughput and p50/p95/p99 latency. Results are written
+as JSON; with --baseline they are compared and the script exits with status 1
+when a benchmark's p50 is slower than the baseline by more than --tolerance.
+
+Usage (PowerShell):
+    python .\\scripts\\benchmark_api.py --output bench_results.json
+    python .\\scripts\\benchmark_api.py --save-baseline scripts\\benchmark_baseline.json
+    python .\\scripts\\benchmark_api.py --baseline scripts\\benchmark_baseline.json --tolerance 0.25
+    python .\\scripts\\benchmark_api.py --only predict,rag --quick
+    python .\\scripts\\benchmark_api.py --only serialize,endpoints --endpoint-sizes 1,1000,10000
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / 'scripts'))
+
+GROUPS = ('prepare_input', 'predict', 'endpoints', 'serialize', 'train', 'rag', 'chat')
+
+
+def percentile(sorted_vals, q):
+    if not sorted_vals:
+        return None
+    k = (len(sorted_vals) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_vals) - 1)
+    return sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * (k - lo)
+
+
+def measure(fn, items=1, min_time=1.0, min_iters=5, max_iters=1000, warmup=1):
+    """Run fn repeatedly; return latency percentiles (ms) and throughput (ops/s, items/s)."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < max_iters and (len(samples) < min_iters or time.perf_counter() - started < min_time):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    total = sum(samples)
+    s = sorted(samples)
+    return {
+        'iterations': len(samples),
+        'items': items,
+        'p50_ms': round(percentile(s, 0.50) * 1000.0, 4),
+        'p95_ms': round(percentile(s, 0.95) * 1000.0, 4),
+        'p99_ms': round(percentile(s, 0.99) * 1000.0, 4),
+        'mean_ms': round(total / len(s) * 1000.0, 4),
+        'ops_per_s': round(len(s) / total, 2) if total else None,
+        'items_per_s': round(len(s) * items / total, 2) if total else None,
+    }
+
+
+def make_rows(n, seed=0, with_labels=False):
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(n):
+        att = rnd.uniform(40, 100)
+        cgpa = rnd.uniform(3, 10)
+        stress = rnd.uniform(0, 10)
+        r = {'Name': f'Student {i}', 'Attendance': round(att, 1), 'CGPA': round(cgpa, 2), 'Stress': round(stress, 1)}
+        if with_labels:
+            score = (att / 100.0) * 0.5 + (cgpa / 10.0) * 0.4 - (stress / 10.0) * 0.3
+            r['label'] = 'Low' if score > 0.55 else ('Medium' if score > 0.4 else 'High')
+        rows.append(r)
+    return rows
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=str(REPO_ROOT),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def setup_environment(tmp_dir, stub_port):
+    """Point the API at a scratch model directory and the stub provider before importing it."""
+    os.environ['GEMINI_API_BASE'] = f'http://127.0.0.1:{stub_port}'
+    os.environ['GEMINI_API_KEY'] = 'benchmark'
+    os.environ['EDUCARE_CHAT_CACHE_TTL'] = '0'  # measure provider round-trips, not cache hits
+    os.environ.setdefault('EDUCARE_ENABLE_FIRESTORE', '0')
+    from model import api
+    src = api.MODEL_DIR
+    dst = Path(tmp_dir) / 'model_job'
+    dst.mkdir(parents=True, exist_ok=True)
+    for name in ('model.joblib', 'feature_columns.json'):
+        if (src / name).exists():
+            shutil.copy2(src / name, dst / name)
+    api.MODEL_DIR = dst
+    api.MODEL_PATH = dst / 'model.joblib'
+    api.META_PATH = dst / 'feature_columns.json'
+    api.RAG_INDEX_PATH = dst / 'rag_index.json'
+    return api
+
+
+def run(args):
+    import stub_provider
+
+    sizes = [int(x) for x in args.sizes.split(',') if x]
+    endpoint_sizes = [int(x) for x in args.endpoint_sizes.split(',') if x]
+    train_sizes = [int(x) for x in args.train_sizes.split(',') if x]
+    only = set(args.only.split(',')) if args.only else set(GROUPS)
+    min_time = 0.2 if args.quick else args.min_time
+    min_iters = 3 if args.quick else 5
+
+    port = free_port()
+    stub = stub_provider.serve(port=port, latency=args.stub_latency, chunk_delay=0.0)
+    tmp_dir = tempfile.mkdtemp(prefix='educare-bench-')
+    results = {}
+    try:
+        api = setup_environment(tmp_dir, port)
+        api.warmup()
+        client = api.app.test_client()
+
+        def post(path, **kwargs):
+            r = client.post(path, **kwargs)
+            r.get_data()
+            r.close()  # like a WSGI server would; releases admission slots
+            return r
+
+        def record(name, stats, size_bytes=None):
+            if size_bytes is not None:
+                stats['bytes'] = size_bytes
+            results[name] = stats
+            print(f"{name:<32} p50 {stats['p50_ms']:>10.3f} ms  p95 {stats['p95_ms']:>10.3f} ms  "
+                  f"p99 {stats['p99_ms']:>10.3f} ms  {stats['items_per_s']:>12.1f} items/s  ({stats['iterations']} iters)"
+                  + (f"  {size_bytes} bytes" if size_bytes is not None else ''))
+
+        model, meta = api.load_model()
+        features = meta.get('features', [])
+
+        if 'prepare_input' in only:
+            for n in sizes:
+                rows = make_rows(n)
+                record(f'prepare_input[{n}]', measure(lambda: api.prepare_input(rows, features), items=n,
+                                                       min_time=min_time, min_iters=min_iters))
+
+        if 'predict' in only:
+            for n in sizes:
+                X = api.prepare_input(make_rows(n), features).X
+                record(f'model.predict[{n}]', measure(lambda: model.predict(X), items=n,
+                                                       min_time=min_time, min_iters=min_iters))
+                if hasattr(model, 'predict_proba'):
+                    record(f'model.predict_proba[{n}]', measure(lambda: model.predict_proba(X), items=n,
+                                                                 min_time=min_time, min_iters=min_iters))
+
+        if 'endpoints' in only:
+            for n in endpoint_sizes:
+                rows = make_rows(n)
+
+                def call_predict():
+                    r = post('/predict', json=rows)
+                    assert r.status_code == 200, r.data[:200]
+
+                def call_predict_columnar():
+                    r = post('/predict?format=columnar', json=rows)
+                    assert r.status_code == 200, r.data[:200]
+
+                def call_upload():
+                    r = post('/upload', json=rows)
+                    assert r.status_code == 200, r.data[:200]
+                record(f'POST /predict[{n}]', measure(call_predict, items=n, min_time=min_time, min_iters=min_iters),
+                       len(post('/predict', json=rows).data))
+                record(f'POST /predict columnar[{n}]', measure(call_predict_columnar, items=n, min_time=min_time,
+                                                               min_iters=min_iters),
+                       len(post('/predict?format=columnar', json=rows).data))
+                from model import request_codec
+                matrix = request_codec.encode_matrix(api.prepare_input(rows, features).X)
+
+                def call_predict_matrix():
+                    r = post('/predict', data=matrix, content_type=request_codec.MATRIX_CONTENT_TYPE)
+                    assert r.status_code == 200, r.data[:200]
+                record(f'POST /predict matrix[{n}]', measure(call_predict_matrix, items=n, min_time=min_time,
+                                                             min_iters=min_iters), len(matrix))
+                record(f'POST /upload[{n}]', measure(call_upload, items=n, min_time=min_time, min_iters=min_iters))
+
+        if 'serialize' in only:
+            from model import json_codec
+            from flask.json.provider import DefaultJSONProvider
+            std = DefaultJSONProvider(api.app)
+            std.compact = True
+            for n in endpoint_sizes:
+                rows = make_rows(n)
+                X = api.prepare_input(rows, features).X
+                probs = model.predict_proba(X) if hasattr(model, 'predict_proba') else None
+                labels, prob, prob_high = api._prediction_columns(model, meta, model.predict(X), probs)
+                bodies = {
+                    'rows': {'predictions': api._prediction_rows(rows, labels, prob, prob_high)},
+                    'columnar': {'format': 'columnar', 'count': n, 'risk': labels, 'prob': prob, 'probHigh': prob_high},
+                }
+                for fmt, body in bodies.items():
+                    # Flask's stock provider needs plain floats; the conversion is part of its cost
+                    def encode_std():
+                        b = dict(body)
+                        for k in ('prob', 'probHigh'):
+                            if k in b:
+                                b[k] = b[k].tolist()
+                        return std.dumps(b).encode('utf-8')
+
+                    def encode_fast():
+                        return json_codec.dumps(body)
+                    record(f'encode stdlib {fmt}[{n}]', measure(encode_std, items=n, min_time=min_time,
+                                                                min_iters=min_iters), len(encode_std()))
+                    record(f'encode {json_codec.BACKEND} {fmt}[{n}]', measure(encode_fast, items=n, min_time=min_time,
+                                                                            min_iters=min_iters), len(encode_fast()))
+
+        if 'train' in only:
+            for n in train_sizes:
+                body = {'examples': make_rows(n, seed=n, with_labels=True)}
+
+                def call_train():
+                    r = post('/train', json=body)
+                    assert r.status_code == 200, r.data[:200]
+                record(f'POST /train[{n}]', measure(call_train, items=n, min_time=min_time,
+                                                    min_iters=min(3, min_iters), max_iters=20, warmup=0))
+            # leave the scratch model in a known state for later groups
+            api.load_model()
+
+        if 'rag' in only:
+            idx = api.get_rag_index()
+            queries = ['how do I save the chat key', 'firestore service account', 'train the model accuracy',
+                       'predict risk attendance cgpa stress', 'deploy docker nginx']
+            qi = [0]
+
+            def search():
+                idx.search(queries[qi[0] % len(queries)], k=api.RAG_TOP_K)
+                qi[0] += 1
+            record('rag.search', measure(search, min_time=min_time, min_iters=min_iters, max_iters=100000))
+
+        if 'chat' in only:
+            msgs = [{'role': 'system', 'content': 'You are EduCare assistant.'},
+                    {'role': 'user', 'content': 'How can I help a student with high stress?'}]
+
+            def chat():
+                r = post('/chat', json={'messages': msgs, 'use_rag': True, 'raw': False})
+                assert r.status_code == 200, r.data[:200]
+
+            def chat_stream():
+                r = client.post('/chat', json={'messages': msgs, 'stream': True, 'raw': False}, buffered=False)
+                for _ in r.response:
+                    pass
+                r.close()
+            record('POST /chat', measure(chat, min_time=min_time, min_iters=min_iters))
+            record('POST /chat (stream)', measure(chat_stream, min_time=min_time, min_iters=min_iters))
+    finally:
+        stub.shutdown()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'quick': bool(args.quick),
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, tolerance):
+    """Return a list of (name, baseline_p50, current_p50, ratio) for regressions beyond tolerance."""
+    regressions = []
+    base = baseline.get('results', {})
+    for name, stats in current.get('results', {}).items():
+        b = base.get(name)
+        if not b or not b.get('p50_ms'):
+            continue
+        ratio = stats['p50_ms'] / b['p50_ms']
+        flag = 'REGRESSION' if ratio > 1.0 + tolerance else ''
+        print(f'{name:<32} baseline {b["p50_ms"]:>10.3f} ms  now {stats["p50_ms"]:>10.3f} ms  x{ratio:5.2f} {flag}')
+        if flag:
+            regressions.append((name, b['p50_ms'], stats['p50_ms'], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='1,10,1000,100000', help='Batch sizes for prepare_input/predict')
+    parser.add_argument('--endpoint-sizes', default='1,10,1000', help='Batch sizes for /predict and /upload')
+    parser.add_argument('--train-sizes', default='100,1000,5000', help='Dataset sizes for /train')
+    parser.add_argument('--only', default='', help=f'Comma-separated subset of: {",".join(GROUPS)}')
+    parser.add_argument('--min-time', type=float, default=1.0, help='Minimum seconds to sample each benchmark')
+    parser.add_argument('--quick', action='store_true', help='Fewer iterations (smoke run)')
+    parser.add_argument('--stub-latency', type=float, default=0.0, help='Artificial stub provider latency (s)')
+    parser.add_argument('--output', default='', help='Write results JSON here')
+    parser.add_argument('--save-baseline', default='', help='Write results JSON as the new baseline')
+    parser.add_argument('--baseline', default='', help='Compare against this baseline JSON')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed p50 slowdown before flagging (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    current = run(args)
+    for path in (args.output, args.save_baseline):
+        if path:
+            Path(path).write_text(json.dumps(current, indent=2), encoding='utf-8')
+            print(f'Wrote {path}')
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding='utf-8'))
+        print(f'\nComparison with {args.baseline} (commit {baseline.get("meta", {}).get("commit")}):')
+        regressions = compare(current, baseline, args.tolerance)
+        if regressions:
+            print(f'\n{len(regressions)} benchmark(s) regressed by more than {args.tolerance:.0%}')
+            sys.exit(1)
+        print('\nNo regressions beyond tolerance.')
+
+
+if __name__ == '__main__':
+    main()
@@ -3,105 +3,221 @@
 This script connects to Firestore using a service account JSON (default: firebase/serviceAccountKey.json)
 and deletes documents in specified collections that contain no meaningful (non-null/non-empty) fields.
 
+Collections are scanned page by page in document-id order with query cursors
+(memory stays bounded by --page-size), each collection is split into
+--partitions key ranges, and the resulting (collection, range) tasks run
+concurrently on a pool of --workers threads. Deletes are grouped into write
+batches of up to 500. Progress and throughput are printed every
+--progress-interval seconds; with --checkpoint the last processed id of every
+task is saved after each page, so an interrupted run continues with --resume.
+The checkpoint never moves past an empty document that is still there: when
+a delete batch fails or --limit cuts a page short, the task stops just before
+the first such document and --resume starts again from it.
+
+Set FIRESTORE_EMULATOR_HOST to run against the emulator, or pass --fake N to
+run against an in-memory client seeded with N documents per collection.
+
 Usage (PowerShell):
-    python .\scripts\clean_empty_firestore.py --dry-run
-    python .\scripts\clean_empty_firestore.py --confirm   # actually delete
-    python .\scripts\clean_empty_firestore.py --collections students,parents,counselors --confirm
+    python .\\scripts\\clean_empty_firestore.py --dry-run
+    python .\\scripts\\clean_empty_firestore.py --confirm   # actually delete
+    python .\\scripts\\clean_empty_firestore.py --collections students,parents,counselors --confirm
+    python .\\scripts\\clean_empty_firestore.py --confirm --workers 8 --partitions 4 --checkpoint cleanup.ckpt.json
+    python .\\scripts\\clean_empty_firestore.py --confirm --checkpoint cleanup.ckpt.json --resume
+    python .\\scripts\\clean_empty_firestore.py --fake 20000 --fake-latency 0.02 --confirm
 
 Safety: By default it runs in dry-run mode and only prints what it would delete. Use --confirm to perform deletions.
 """
 import argparse
 import json
 import sys
-from typing import Any
-
-try:
-    import firebase_admin
-    from firebase_admin import credentials, firestore
-except Exception as e:
-    print("firebase-admin is required. Install with: pip install firebase-admin")
-    raise
-
-
-def is_meaningful(obj: Any) -> bool:
-    if obj is None:
-        return False
-    if isinstance(obj, str):
-        return obj.strip() != ""
-    if isinstance(obj, (int, float, bool)):
-        return True
-    if isinstance(obj, dict):
-        return any(is_meaningful(v) for v in obj.values())
-    if isinstance(obj, (list, tuple)):
-        return len(obj) > 0 and any(is_meaningful(v) for v in obj)
-    return False
-
-
-def doc_is_empty(data: dict) -> bool:
-    # Consider doc empty if none of its top-level fields are meaningful
-    if not data:
-        return True
-    for k, v in data.items():
-        if is_meaningful(v):
-            return False
-    return True
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, Tuple
+
+from firestore_utils import (DEFAULT_COLLECTIONS, DEFAULT_SERVICE_ACCOUNT, MAX_BATCH_WRITES, Checkpoint, Progress,
+                             connect, doc_is_empty, id_partitions, iter_pages)
+
+
+class Cleaner:
+    def __init__(self, db, args, progress: Progress, checkpoint: Checkpoint):
+        self.db = db
+        self.args = args
+        self.progress = progress
+        self.checkpoint = checkpoint
+        self.stop = threading.Event()
+        self._lock = threading.Lock()
+        self._shown = 0
+        self._deletions_left = args.limit or None
+
+    def _reserve(self, n: int) -> int:
+        """Claim up to n deletions from the shared --limit budget."""
+        with self._lock:
+            if self._deletions_left is None:
+                return n
+            n = min(n, self._deletions_left)
+            self._deletions_left -= n
+            if self._deletions_left <= 0:
+                self.stop.set()
+            return n
+
+    def _show(self, col: str, snap, data: dict) -> None:
+        with self._lock:
+            if self._shown >= self.args.show:
+                return
+            self._shown += 1
+        print(f"    EMPTY -> {col}/{snap.id}")
+        if not self.args.confirm:
+            preview = {k: (v if isinstance(v, (str, int, float, bool)) else type(v).__name__) for k, v in list(data.items())[:6]}
+            print(f"      (dry-run) fields preview: {json.dumps(preview)}")
+
+    def _delete(self, col: str, refs) -> Tuple[int, Optional[int]]:
+        """Delete refs in write batches; return (deleted, index of the first ref not deleted, or None)."""
+        deleted = 0
+        first_failed = None
+        for i in range(0, len(refs), self.args.batch_size):
+            chunk = refs[i:i + self.args.batch_size]
+            batch = self.db.batch()
+            for ref in chunk:
+                batch.delete(ref)
+            try:
+                batch.commit()
+                deleted += len(chunk)
+            except Exception as e:
+                if first_failed is None:
+                    first_failed = i
+                self.progress.add('failed', len(chunk))
+                print(f"      Failed to delete batch of {len(chunk)} in {col} (first {chunk[0].id}): {e}")
+        return deleted, first_failed
+
+    def run_task(self, col: str, start, end) -> dict:
+        key = f"{'delete' if self.args.confirm else 'scan'}:{col}:{start or ''}-{end or ''}"
+        state = self.checkpoint.get(key)
+        counts = {k: state.get(k, 0) for k in ('scanned', 'empty', 'deleted')}
+        if state.get('done'):
+            return dict(counts, collection=col)
+        if self.stop.is_set():
+            return dict(counts, collection=col, stopped=True)
+        last_id = state.get('last_id')
+        for page in iter_pages(self.db, col, page_size=self.args.page_size, start=start, end=end,
+                               after=last_id):
+            empties = []
+            positions = []  # index in page of each empty
+            for pos, snap in enumerate(page):
+                data = snap.to_dict() or {}
+                if doc_is_empty(data):
+                    empties.append(snap.reference)
+                    positions.append(pos)
+                    self._show(col, snap, data)
+            deleted = 0
+            pending = None  # index into empties of the first one left in place
+            if self.args.confirm and empties:
+                allowed = self._reserve(len(empties))
+                deleted, pending = self._delete(col, empties[:allowed])
+                if pending is None and allowed < len(empties):
+                    pending = allowed
+            before = dict(counts)
+            counts['scanned'] += len(page)
+            counts['empty'] += len(empties)
+            counts['deleted'] += deleted
+            self.progress.add('docs', len(page))
+            self.progress.add('empty', len(empties))
+            self.progress.add('deleted', deleted)
+            if pending is not None:
+                # checkpoint up to the document before the first empty still there, then stop so
+                # --resume revisits it; documents deleted further on are gone and counted here
+                cut = positions[pending]
+                self.checkpoint.update(key, last_id=page[cut - 1].id if cut else last_id,
+                                       scanned=before['scanned'] + cut + deleted - pending,
+                                       empty=before['empty'] + deleted, deleted=counts['deleted'])
+                return dict(counts, collection=col, stopped=True)
+            # a page is only checkpointed once its deletes were committed
+            last_id = page[-1].id
+            self.checkpoint.update(key, last_id=last_id, **counts)
+            if self.stop.is_set():
+                return dict(counts, collection=col, stopped=True)
+        self.checkpoint.update(key, done=True, **counts)
+        return dict(counts, collection=col)
 
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument("--service-account", default="firebase/serviceAccountKey.json", help="Path to service account JSON")
-    parser.add_argument("--collections", default="students,parents,counselors,admins,sessions,uploads,training_examples",
+    parser.add_argument("--service-account", default=DEFAULT_SERVICE_ACCOUNT, help="Path to service account JSON")
+    parser.add_argument("--project", default=None, help="Project id (emulator only)")
+    parser.add_argument("--collections", default=','.join(DEFAULT_COLLECTIONS),
                         help="Comma-separated collection names to scan")
     parser.add_argument("--confirm", action="store_true", help="Actually delete matching documents (default is dry-run)")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be deleted (the default)")
     parser.add_argument("--limit", type=int, default=0, help="Limit number of deletions (0 = no limit)")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent scan tasks")
+    parser.add_argument("--partitions", type=int, default=1, help="Key-range partitions per collection")
+    parser.add_argument("--page-size", type=int, default=500, help="Documents fetched per query page")
+    parser.add_argument("--batch-size", type=int, default=MAX_BATCH_WRITES, help="Deletes per write batch (max 500)")
+    parser.add_argument("--checkpoint", default="", help="JSON file recording per-task progress")
+    parser.add_argument("--resume", action="store_true", help="Continue from --checkpoint instead of starting over")
+    parser.add_argument("--progress-interval", type=float, default=5.0, help="Seconds between progress lines (0 = off)")
+    parser.add_argument("--show", type=int, default=50, help="Print at most this many empty documents")
+    parser.add_argument("--fake", type=int, default=0, help="Use an in-memory client seeded with N docs per collection")
+    parser.add_argument("--fake-latency", type=float, default=0.0, help="Simulated round-trip seconds for --fake")
     args = parser.parse_args()
+    if args.confirm and args.dry_run:
+        parser.error("--confirm and --dry-run are mutually exclusive")
+    if args.resume and not args.checkpoint:
+        parser.error("--resume requires --checkpoint")
+    args.batch_size = max(1, min(args.batch_size, MAX_BATCH_WRITES))
 
-    sa = args.service_account
     try:
-        cred = credentials.Certificate(sa)
-        firebase_admin.initialize_app(cred)
+        db = connect(args.service_account, project=args.project, fake=args.fake, fake_latency=args.fake_latency)
     except Exception as e:
-        print(f"Failed to initialize Firebase Admin with '{sa}': {e}")
+        print(f"Failed to initialize Firestore client with '{args.service_account}': {e}")
         sys.exit(1)
 
-    db = firestore.client()
     cols = [c.strip() for c in args.collections.split(',') if c.strip()]
-
-    total_candidates = 0
-    total_deleted = 0
-
-    for col in cols:
-        print(f"Scanning collection: {col}")
+    tasks = [(col, start, end) for col in cols for start, end in id_partitions(args.partitions)]
+    progress = Progress(args.progress_interval, label='docs').start()
+    checkpoint = Checkpoint(args.checkpoint or None, resume=args.resume)
+    cleaner = Cleaner(db, args, progress, checkpoint)
+    print(f"Scanning {len(cols)} collection(s) as {len(tasks)} task(s) on {args.workers} worker(s)"
+          f"{' (resuming)' if args.resume else ''}")
+
+    per_col = {col: {'scanned': 0, 'empty': 0, 'deleted': 0} for col in cols}
+    interrupted = False
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = {pool.submit(cleaner.run_task, *t): t for t in tasks}
         try:
-            docs = list(db.collection(col).stream())
-        except Exception as e:
-            print(f"  Failed to list collection '{col}': {e}")
-            continue
-        print(f"  Found {len(docs)} documents in {col}")
-        for d in docs:
-            data = d.to_dict() or {}
-            if doc_is_empty(data):
-                total_candidates += 1
-                print(f"    EMPTY -> {col}/{d.id}")
-                if args.confirm:
-                    try:
-                        db.collection(col).document(d.id).delete()
-                        total_deleted += 1
-                        print(f"      Deleted {col}/{d.id}")
-                    except Exception as e:
-                        print(f"      Failed to delete {col}/{d.id}: {e}")
-                else:
-                    # dry-run: print sample of fields
-                    # limit output to small preview
-                    preview = {k: (v if isinstance(v, (str, int, float, bool)) else type(v).__name__) for k, v in list(data.items())[:6]}
-                    print(f"      (dry-run) fields preview: {json.dumps(preview)}")
-                if args.limit and total_deleted >= args.limit:
-                    print("Reached deletion limit; stopping")
-                    break
-        if args.limit and total_deleted >= args.limit:
-            break
-
-    print(f"\nSummary: candidates={total_candidates}, deleted={total_deleted}")
+            for fut in as_completed(futures):
+                col = futures[fut][0]
+                try:
+                    res = fut.result()
+                except Exception as e:
+                    print(f"  Failed to scan collection '{col}' range {futures[fut][1:]}: {e}")
+                    continue
+                for k in per_col[col]:
+                    per_col[col][k] += res[k]
+        except KeyboardInterrupt:
+            interrupted = True
+            cleaner.stop.set()
+            print("Interrupted; waiting for in-flight pages to finish...")
+            for fut in futures:
+                fut.cancel()
+    progress.stop()
+    elapsed = time.monotonic() - progress.started
+
+    print()
+    for col, c in per_col.items():
+        print(f"  {col:<18} scanned={c['scanned']:<8} empty={c['empty']:<7} deleted={c['deleted']}")
+    total_candidates = sum(c['empty'] for c in per_col.values())
+    total_deleted = sum(c['deleted'] for c in per_col.values())
+    scanned = progress.get('docs')
+    print(f"\nSummary: candidates={total_candidates}, deleted={total_deleted}, failed={progress.get('failed')}")
+    print(f"Scanned {scanned} documents in {elapsed:.1f}s ({scanned / max(elapsed, 1e-9):.0f} docs/s this run)")
+    if args.limit and cleaner.stop.is_set() and not interrupted:
+        print("Reached deletion limit; stopping")
+    if progress.get('failed'):
+        print("Some deletes failed; their tasks stopped before the first document left in place.")
+    if interrupted or cleaner.stop.is_set() or progress.get('failed'):
+        if args.checkpoint:
+            print(f"Progress saved; re-run with --checkpoint {args.checkpoint} --resume to continue.")
     if not args.confirm:
         print("Dry-run completed. Re-run with --confirm to actually delete the documents.")
 
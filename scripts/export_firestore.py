@@ -0,0 +1,300 @@
+"""Export Firestore training data to a local snapshot for train_model.py.
+
+Pulls `students` and `training_examples` (by default) with parallel
+partitioned, paginated queries. Each page is converted to a typed column
+batch (float64 features, string text, UTC timestamps) as it streams and is
+appended to a per-task part file, so memory is bounded by --page-size. Parts
+are then merged into one CSV per collection in the snapshot directory,
+together with manifest.json (schema, row counts, createdAt watermark).
+
+manifest.json is the commit point. Each run writes its CSVs under new names
+(`<collection>.<run>.csv`, referenced by the manifest's `file`) and only then
+replaces the manifest atomically, so a run that fails at any step leaves the
+previous manifest, watermarks and files untouched; superseded files are
+removed afterwards.
+
+Every row gets a `risk` column (Low/Medium/High): students keep theirs,
+training_examples map `label` the same way POST /train does (1 -> High,
+otherwise Low). Rows without a usable label are kept with an empty risk and
+skipped by train_model.py. Empty documents (firestore_utils.doc_is_empty)
+are not exported.
+
+Incremental refresh: with --incremental only documents whose createdAt is at
+or after the previous run's watermark are fetched (split into time slices
+queried in parallel) and upserted by document id. Documents without
+createdAt are only picked up by a full export.
+
+Usage (PowerShell):
+    python .\\scripts\\export_firestore.py                       # full export to model/firestore_snapshot
+    python .\\scripts\\export_firestore.py --incremental         # only fetch docs created since the last export
+    python .\\model\\train_model.py --input model/firestore_snapshot --output-dir model/model_job
+    python .\\scripts\\export_firestore.py --fake 20000 --fake-latency 0.02 --workers 8 --partitions 4
+"""
+import argparse
+import datetime
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from firestore_utils import (DEFAULT_SERVICE_ACCOUNT, Progress, connect, doc_is_empty, id_partitions,
+                             iter_pages, iter_query_pages)
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_OUTPUT = REPO_ROOT / 'model' / 'firestore_snapshot'
+SINCE_FIELD = 'createdAt'
+
+# Column name -> type for each exported collection; only these fields are fetched.
+SCHEMAS = {
+    'students': {'name': 'string', 'attendance': 'float', 'cgpa': 'float', 'stress': 'float',
+                 'risk': 'string', SINCE_FIELD: 'timestamp'},
+    'training_examples': {'attendance': 'float', 'cgpa': 'float', 'stress': 'float', 'label': 'string',
+                          'risk': 'string', SINCE_FIELD: 'timestamp'},
+}
+DEFAULT_SCHEMA = {'attendance': 'float', 'cgpa': 'float', 'stress': 'float', 'risk': 'string',
+                  SINCE_FIELD: 'timestamp'}
+RISK_LABELS = {'low': 'Low', 'medium': 'Medium', 'high': 'High'}
+
+
+def normalize_risk(risk, label) -> Optional[str]:
+    """Risk label for a row: an explicit risk wins, else a 0/1 or text label as POST /train reads it."""
+    if isinstance(risk, str) and risk.strip().lower() in RISK_LABELS:
+        return RISK_LABELS[risk.strip().lower()]
+    if label is None or (isinstance(label, str) and not label.strip()):
+        return None
+    if isinstance(label, bool):
+        return 'High' if label else 'Low'
+    if isinstance(label, (int, float)):
+        return 'High' if int(label) == 1 else 'Low'
+    s = str(label).strip().lower()
+    if s in ('high', 'h', '1', 'true', 'yes'):
+        return 'High'
+    if s in ('medium', 'med', 'm'):
+        return 'Medium'
+    return 'Low'
+
+
+def to_batch(snaps, schema: Dict[str, str]) -> pd.DataFrame:
+    """Convert a page of snapshots into a typed column batch."""
+    cols: Dict[str, List] = {'id': []}
+    for name in schema:
+        cols[name] = []
+    for snap in snaps:
+        data = snap.to_dict() or {}
+        if doc_is_empty(data):
+            continue
+        cols['id'].append(snap.id)
+        for name in schema:
+            cols[name].append(data.get(name))
+    if 'risk' in schema:
+        cols['risk'] = [normalize_risk(r, l) for r, l in
+                        zip(cols['risk'], cols.get('label') or [None] * len(cols['risk']))]
+    out = {'id': pd.array(cols['id'], dtype='string')}
+    for name, kind in schema.items():
+        values = cols[name]
+        if kind == 'float':
+            out[name] = pd.to_numeric(pd.Series(values, dtype='object'), errors='coerce').astype('float64')
+        elif kind == 'timestamp':
+            out[name] = pd.to_datetime(pd.Series(values, dtype='object'), errors='coerce', utc=True)
+        else:
+            out[name] = pd.Series([None if v is None else str(v) for v in values], dtype='string')
+    return pd.DataFrame(out)
+
+
+def write_batch(df: pd.DataFrame, path: Path) -> None:
+    header = not path.exists()
+    df.to_csv(path, mode='a', header=header, index=False, date_format='%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def time_slices(since: datetime.datetime, until: datetime.datetime, n: int):
+    """[lo, hi) createdAt slices covering since..until; the last one is open above."""
+    n = max(1, n)
+    step = (until - since) / n
+    edges = [since + step * i for i in range(n)] + [None]
+    return [(edges[i], edges[i + 1]) for i in range(n)]
+
+
+def incremental_pages(db, col: str, lo, hi, page_size: int):
+    fields = list(SCHEMAS.get(col, DEFAULT_SCHEMA))
+    q = db.collection(col).where(SINCE_FIELD, '>=', lo)
+    if hi is not None:
+        q = q.where(SINCE_FIELD, '<', hi)
+    q = q.order_by(SINCE_FIELD).order_by('__name__').select(fields)
+    return iter_query_pages(q, [SINCE_FIELD, '__name__'], page_size)
+
+
+def export_task(pages, schema, part: Path, progress: Progress) -> Dict:
+    rows = 0
+    watermark = None
+    for page in pages:
+        batch = to_batch(page, schema)
+        progress.add('docs', len(page))
+        if batch.empty:
+            continue
+        write_batch(batch, part)
+        rows += len(batch)
+        progress.add('rows', len(batch))
+        if SINCE_FIELD in batch:
+            top = batch[SINCE_FIELD].max()
+            if pd.notna(top) and (watermark is None or top > watermark):
+                watermark = top
+    return {'rows': rows, 'watermark': watermark}
+
+
+def merge_parts(target: Path, parts: List[Path], previous: Optional[Path], chunksize: int = 50000) -> int:
+    """Write target (a new file) from the new part files, plus rows of `previous` whose id was not re-exported."""
+    tmp = target.with_suffix('.csv.tmp')
+    if tmp.exists():
+        tmp.unlink()
+    new_ids = set()
+    rows = 0
+    with open(tmp, 'w', encoding='utf-8', newline='') as out:
+        header_done = False
+        for part in parts:
+            if not part.exists():
+                continue
+            for chunk in pd.read_csv(part, dtype={'id': 'string'}, chunksize=chunksize):
+                new_ids.update(chunk['id'].tolist())
+                chunk.to_csv(out, header=not header_done, index=False)
+                header_done = True
+                rows += len(chunk)
+        if previous is not None and previous.exists():
+            for chunk in pd.read_csv(previous, dtype={'id': 'string'}, chunksize=chunksize):
+                chunk = chunk[~chunk['id'].isin(new_ids)]
+                chunk.to_csv(out, header=not header_done, index=False)
+                header_done = True
+                rows += len(chunk)
+    os.replace(tmp, target)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--service-account", default=DEFAULT_SERVICE_ACCOUNT, help="Path to service account JSON")
+    parser.add_argument("--project", default=None, help="Project id (emulator only)")
+    parser.add_argument("--collections", default='students,training_examples', help="Comma-separated collections to export")
+    parser.add_argument("--output-dir", "-o", default=str(DEFAULT_OUTPUT), help="Snapshot directory")
+    parser.add_argument("--incremental", action="store_true",
+                        help=f"Only fetch documents whose {SINCE_FIELD} is at or after the last export")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent query tasks")
+    parser.add_argument("--partitions", type=int, default=4, help="Key ranges (full) or time slices (incremental) per collection")
+    parser.add_argument("--page-size", type=int, default=500, help="Documents fetched per query page")
+    parser.add_argument("--progress-interval", type=float, default=5.0, help="Seconds between progress lines (0 = off)")
+    parser.add_argument("--fake", type=int, default=0, help="Use an in-memory client seeded with N docs per collection")
+    parser.add_argument("--fake-latency", type=float, default=0.0, help="Simulated round-trip seconds for --fake")
+    args = parser.parse_args()
+
+    try:
+        db = connect(args.service_account, project=args.project, fake=args.fake, fake_latency=args.fake_latency)
+    except Exception as e:
+        print(f"Failed to initialize Firestore client with '{args.service_account}': {e}")
+        sys.exit(1)
+
+    out_dir = Path(args.output_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = out_dir / 'manifest.json'
+    manifest = json.loads(manifest_path.read_text(encoding='utf-8')) if manifest_path.exists() else {}
+    manifest.setdefault('collections', {})
+    cols = [c.strip() for c in args.collections.split(',') if c.strip()]
+    run_started = datetime.datetime.now(datetime.timezone.utc)
+    work = Path(tempfile.mkdtemp(prefix='export-', dir=str(out_dir)))
+    progress = Progress(args.progress_interval, label='docs').start()
+
+    plans = {}
+    for col in cols:
+        schema = SCHEMAS.get(col, DEFAULT_SCHEMA)
+        prev = manifest['collections'].get(col) or {}
+        since = prev.get('watermark') if args.incremental else None
+        if args.incremental and not since:
+            print(f"  {col}: no previous watermark; doing a full export")
+        if since:
+            since_dt = datetime.datetime.fromisoformat(since)
+            slices = time_slices(since_dt, max(run_started, since_dt), args.partitions)
+            tasks = [(lo, hi, incremental_pages(db, col, lo, hi, args.page_size)) for lo, hi in slices]
+        else:
+            tasks = [(s, e, iter_pages(db, col, page_size=args.page_size, fields=list(schema), start=s, end=e))
+                     for s, e in id_partitions(args.partitions)]
+        plans[col] = {'schema': schema, 'since': since, 'tasks': tasks, 'parts': []}
+        print(f"Exporting {col}: {'incremental since ' + since if since else 'full'} ({len(tasks)} task(s))")
+
+    results = {col: [] for col in cols}
+    failed = False
+    run_tag = run_started.strftime('%Y%m%dT%H%M%S%fZ')
+    written = []  # files of this run, removed again unless the manifest swap published them
+    committed = False
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+            futures = {}
+            for col, plan in plans.items():
+                for i, (_lo, _hi, pages) in enumerate(plan['tasks']):
+                    part = work / f'{col}.{i:03d}.csv'
+                    plan['parts'].append(part)
+                    futures[pool.submit(export_task, pages, plan['schema'], part, progress)] = col
+            for fut in as_completed(futures):
+                col = futures[fut]
+                try:
+                    results[col].append(fut.result())
+                except Exception as e:
+                    failed = True
+                    print(f"  Failed to export part of {col}: {e}")
+        progress.stop()
+        if failed:
+            print("Export incomplete; the previous snapshot was left unchanged.")
+            sys.exit(1)
+
+        # every collection is merged into a file no manifest points to yet; the manifest swap publishes them
+        new_manifest = json.loads(json.dumps(manifest))
+        superseded = []
+        for col, plan in plans.items():
+            target = out_dir / f'{col}.{run_tag}.csv'
+            old_file = (manifest['collections'].get(col) or {}).get('file')
+            previous = out_dir / old_file if plan['since'] and old_file else None
+            if old_file:
+                superseded.append(out_dir / old_file)
+            fetched = sum(r['rows'] for r in results[col])
+            written.append(target)
+            total = merge_parts(target, plan['parts'], previous)
+            marks = [r['watermark'] for r in results[col] if r['watermark'] is not None]
+            prev_mark = (manifest['collections'].get(col) or {}).get('watermark')
+            watermark = max(marks).isoformat() if marks else prev_mark
+            new_manifest['collections'][col] = {
+                'file': target.name,
+                'rows': total,
+                'schema': {'id': 'string', **plan['schema']},
+                'watermark': watermark,
+                'mode': 'incremental' if plan['since'] else 'full',
+                'fetched': fetched,
+                'exported_at': run_started.isoformat(),
+            }
+            print(f"  {col:<18} fetched={fetched:<8} rows={total:<8} watermark={watermark}")
+        new_manifest['updated_at'] = run_started.isoformat()
+        tmp_manifest = work / 'manifest.json'
+        tmp_manifest.write_text(json.dumps(new_manifest, indent=2), encoding='utf-8')
+        os.replace(tmp_manifest, manifest_path)
+        committed = True
+        for old in superseded:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+    finally:
+        if not committed:
+            for path in written:
+                path.unlink(missing_ok=True)
+        progress.stop()
+        shutil.rmtree(work, ignore_errors=True)
+
+    elapsed = time.monotonic() - progress.started
+    print(f"\nRead {progress.get('docs')} documents in {elapsed:.1f}s ({progress.rate('docs'):.0f} docs/s); "
+          f"snapshot written to {out_dir}")
+
+
+if __name__ == '__main__':
+    main()
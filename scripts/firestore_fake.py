@@ -0,0 +1,291 @@
+"""In-memory stand-in for the Firestore client used by the maintenance scripts.
+
+Implements the subset of the google-cloud-firestore API the scripts rely on:
+collection/document references, `order_by`/`where`/`select`/`limit`,
+`start_at`/`start_after`/`end_before` cursors, `stream()`, `count()`
+aggregation, and write batches (max 500 writes). An optional per-call latency
+simulates network round-trips, so paging, batching and parallelism behave
+(and can be measured) as they would against the real service.
+
+Usage: every script accepts --fake N to run against N seeded documents per
+collection, e.g.
+    python .\\scripts\\clean_empty_firestore.py --fake 20000 --fake-latency 0.02 --workers 8
+"""
+import copy
+import datetime
+import random
+import string
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+_AUTO_ID_CHARS = string.ascii_letters + string.digits
+
+
+def auto_id(rnd: random.Random) -> str:
+    return ''.join(rnd.choice(_AUTO_ID_CHARS) for _ in range(20))
+
+
+def _get(data: Dict, field: str):
+    cur = data
+    for part in field.split('.'):
+        if not isinstance(cur, dict) or part not in cur:
+            return None
+        cur = cur[part]
+    return cur
+
+
+_OPS = {
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+    '<': lambda a, b: a is not None and a < b,
+    '<=': lambda a, b: a is not None and a <= b,
+    '>': lambda a, b: a is not None and a > b,
+    '>=': lambda a, b: a is not None and a >= b,
+    'in': lambda a, b: a in b,
+}
+
+
+class FakeSnapshot:
+    def __init__(self, reference: 'FakeDocument', data: Optional[Dict]):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self) -> Optional[Dict]:
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field: str):
+        return _get(self._data or {}, field)
+
+
+class FakeDocument:
+    def __init__(self, client: 'FakeClient', collection: str, doc_id: str):
+        self._client = client
+        self.collection_name = collection
+        self.id = doc_id
+        self.path = f'{collection}/{doc_id}'
+
+    def get(self) -> FakeSnapshot:
+        self._client._roundtrip()
+        with self._client._lock:
+            data = self._client._data.get(self.collection_name, {}).get(self.id)
+        return FakeSnapshot(self, copy.deepcopy(data))
+
+    def set(self, data: Dict, merge: bool = False) -> None:
+        self._client._roundtrip()
+        self._client._write('set', self, data, merge)
+
+    def delete(self) -> None:
+        self._client._roundtrip()
+        self._client._write('delete', self, None, False)
+
+
+class _Aggregation:
+    def __init__(self, query: 'FakeQuery'):
+        self._query = query
+
+    def get(self):
+        self._query._client._roundtrip()
+        n = len(self._query._matches(ignore_limit=False))
+
+        class _Result:
+            alias = 'count'
+            value = n
+        return [[_Result()]]
+
+
+class FakeQuery:
+    def __init__(self, client: 'FakeClient', collection: str):
+        self._client = client
+        self._collection = collection
+        self._filters = []
+        self._orders: List[str] = []
+        self._projection = None
+        self._start = None  # (values tuple, inclusive)
+        self._end = None
+        self._limit = None
+
+    def _copy(self, **changes) -> 'FakeQuery':
+        q = FakeQuery(self._client, self._collection)
+        q.__dict__.update({k: v for k, v in self.__dict__.items()})
+        q._filters = list(self._filters)
+        q._orders = list(self._orders)
+        q.__dict__.update(changes)
+        return q
+
+    def where(self, field_path=None, op_string=None, value=None, *, filter=None) -> 'FakeQuery':
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(_filters=self._filters + [(field_path, op_string, value)])
+
+    def order_by(self, field_path: str, direction: str = 'ASCENDING') -> 'FakeQuery':
+        return self._copy(_orders=self._orders + [field_path])
+
+    def select(self, field_paths) -> 'FakeQuery':
+        return self._copy(_projection=list(field_paths))
+
+    def limit(self, count: int) -> 'FakeQuery':
+        return self._copy(_limit=int(count))
+
+    def _cursor(self, fields) -> tuple:
+        orders = self._orders or ['__name__']
+        if isinstance(fields, FakeSnapshot):
+            return tuple(fields.id if o == '__name__' else fields.get(o) for o in orders)
+        return tuple(fields.get(o) for o in orders if o in fields)
+
+    def start_at(self, fields) -> 'FakeQuery':
+        return self._copy(_start=(self._cursor(fields), True))
+
+    def start_after(self, fields) -> 'FakeQuery':
+        return self._copy(_start=(self._cursor(fields), False))
+
+    def end_before(self, fields) -> 'FakeQuery':
+        return self._copy(_end=(self._cursor(fields), False))
+
+    def end_at(self, fields) -> 'FakeQuery':
+        return self._copy(_end=(self._cursor(fields), True))
+
+    def count(self, alias=None) -> _Aggregation:
+        return _Aggregation(self)
+
+    def _key(self, doc_id: str, data: Dict) -> tuple:
+        orders = self._orders or ['__name__']
+        return tuple(doc_id if o == '__name__' else _get(data, o) for o in orders)
+
+    def _matches(self, ignore_limit: bool = False) -> List:
+        with self._client._lock:
+            items = list(self._client._data.get(self._collection, {}).items())
+        out = []
+        for doc_id, data in items:
+            ok = True
+            for field, op, value in self._filters:
+                actual = doc_id if field == '__name__' else _get(data, field)
+                if not _OPS[op](actual, value):
+                    ok = False
+                    break
+            if not ok:
+                continue
+            # like Firestore, documents missing an ordered field are excluded
+            key = self._key(doc_id, data)
+            if any(k is None for k in key):
+                continue
+            out.append((key, doc_id, data))
+        out.sort(key=lambda t: t[0])
+        if self._start is not None:
+            vals, inclusive = self._start
+            n = len(vals)
+            out = [t for t in out if (t[0][:n] >= vals if inclusive else t[0][:n] > vals)]
+        if self._end is not None:
+            vals, inclusive = self._end
+            n = len(vals)
+            out = [t for t in out if (t[0][:n] <= vals if inclusive else t[0][:n] < vals)]
+        if self._limit is not None and not ignore_limit:
+            out = out[:self._limit]
+        return out
+
+    def stream(self):
+        self._client._roundtrip()
+        for _, doc_id, data in self._matches():
+            if self._projection is not None:
+                data = {f: _get(data, f) for f in self._projection if _get(data, f) is not None}
+            yield FakeSnapshot(FakeDocument(self._client, self._collection, doc_id), copy.deepcopy(data))
+
+    def get(self):
+        return list(self.stream())
+
+
+class FakeCollection(FakeQuery):
+    def document(self, doc_id: Optional[str] = None) -> FakeDocument:
+        return FakeDocument(self._client, self._collection, doc_id or auto_id(self._client._rnd))
+
+    def add(self, data: Dict):
+        ref = self.document()
+        ref.set(data)
+        return None, ref
+
+
+class FakeBatch:
+    def __init__(self, client: 'FakeClient'):
+        self._client = client
+        self._ops = []
+
+    def set(self, ref: FakeDocument, data: Dict, merge: bool = False) -> None:
+        self._ops.append(('set', ref, data, merge))
+
+    def delete(self, ref: FakeDocument) -> None:
+        self._ops.append(('delete', ref, None, False))
+
+    def __len__(self):
+        return len(self._ops)
+
+    def commit(self):
+        if len(self._ops) > 500:
+            raise ValueError('maximum 500 writes allowed per request')
+        self._client._roundtrip()
+        self._client.commits += 1
+        for op in self._ops:
+            self._client._write(*op)
+        self._ops = []
+
+
+class FakeClient:
+    def __init__(self, latency: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self._data: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self._rnd = random.Random(seed)
+        self.roundtrips = 0
+        self.commits = 0
+
+    def _roundtrip(self):
+        with self._lock:
+            self.roundtrips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _write(self, kind: str, ref: FakeDocument, data: Optional[Dict], merge: bool) -> None:
+        with self._lock:
+            col = self._data.setdefault(ref.collection_name, {})
+            if kind == 'delete':
+                col.pop(ref.id, None)
+            elif merge and ref.id in col:
+                col[ref.id].update(copy.deepcopy(data))
+            else:
+                col[ref.id] = copy.deepcopy(data)
+
+    def collection(self, name: str) -> FakeCollection:
+        return FakeCollection(self, name)
+
+    def batch(self) -> FakeBatch:
+        return FakeBatch(self)
+
+    def size(self, collection: str) -> int:
+        return len(self._data.get(collection, {}))
+
+    @classmethod
+    def seeded(cls, per_collection: int, latency: float = 0.0, empty_ratio: float = 0.1, seed: int = 0,
+               collections=None) -> 'FakeClient':
+        """A client holding `per_collection` documents in each collection, ~empty_ratio of them empty."""
+        from firestore_utils import DEFAULT_COLLECTIONS
+        c = cls(latency=latency, seed=seed)
+        rnd = random.Random(seed)
+        epoch = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        for col in collections or DEFAULT_COLLECTIONS:
+            docs = c._data.setdefault(col, {})
+            for i in range(per_collection):
+                created = epoch + datetime.timedelta(minutes=i)
+                if rnd.random() < empty_ratio:
+                    docs[auto_id(rnd)] = rnd.choice([{}, {'name': '', 'createdAt': created}, {'name': None}])
+                    continue
+                att, cgpa, stress = round(rnd.uniform(40, 100), 1), round(rnd.uniform(3, 10), 2), round(rnd.uniform(0, 10), 1)
+                if col == 'training_examples':
+                    label = 1 if (att < 65 or cgpa < 5 or stress > 7) else 0
+                    docs[auto_id(rnd)] = {'attendance': att, 'cgpa': cgpa, 'stress': stress, 'label': label,
+                                          'createdAt': created}
+                else:
+                    risk = 'High' if (att < 65 or cgpa < 5 or stress > 7) else ('Medium' if att < 80 else 'Low')
+                    docs[auto_id(rnd)] = {'name': f'{col[:-1].title()} {i}', 'attendance': att, 'cgpa': cgpa,
+                                          'stress': stress, 'risk': risk, 'createdAt': created}
+        return c
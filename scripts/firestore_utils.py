@@ -0,0 +1,210 @@
+"""Shared helpers for the Firestore maintenance scripts (cleanup, audit, export).
+
+ - `connect()` returns a client for the Firestore emulator when
+   FIRESTORE_EMULATOR_HOST is set, otherwise initializes firebase-admin with
+   the service account; `--fake` runs use scripts/firestore_fake.py instead.
+ - `iter_pages()` streams a collection in document-id order one page at a time
+   using query cursors, so memory is bounded by the page size regardless of
+   collection size. `id_partitions()` splits the id space into key ranges that
+   can be scanned concurrently.
+ - `is_meaningful()` / `doc_is_empty()` are the single definition of an
+   "empty" document used by every script.
+ - `Progress` and `Checkpoint` provide throughput output and resumable state.
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+DEFAULT_COLLECTIONS = ('students', 'parents', 'counselors', 'admins', 'sessions', 'uploads', 'training_examples')
+DEFAULT_SERVICE_ACCOUNT = 'firebase/serviceAccountKey.json'
+# Characters of Firestore auto-generated ids, in byte (= index) order.
+ID_ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+# Firestore limit on writes per batch commit.
+MAX_BATCH_WRITES = 500
+
+
+def is_meaningful(obj: Any) -> bool:
+    if obj is None:
+        return False
+    if isinstance(obj, str):
+        return obj.strip() != ""
+    if isinstance(obj, (int, float, bool)):
+        return True
+    if isinstance(obj, dict):
+        return any(is_meaningful(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return len(obj) > 0 and any(is_meaningful(v) for v in obj)
+    # timestamps, references and other special values alone do not make a document meaningful
+    return False
+
+
+def doc_is_empty(data: dict) -> bool:
+    # Consider doc empty if none of its top-level fields are meaningful
+    if not data:
+        return True
+    for v in data.values():
+        if is_meaningful(v):
+            return False
+    return True
+
+
+def connect(service_account: str = DEFAULT_SERVICE_ACCOUNT, project: Optional[str] = None, fake: int = 0,
+            fake_latency: float = 0.0):
+    """Return a Firestore client: fake (in-memory), emulator, or firebase-admin with a service account."""
+    if fake:
+        import firestore_fake
+        return firestore_fake.FakeClient.seeded(fake, latency=fake_latency)
+    if os.environ.get('FIRESTORE_EMULATOR_HOST'):
+        from google.cloud import firestore
+        return firestore.Client(project=project or os.environ.get('GCLOUD_PROJECT') or 'demo-educare')
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+    try:
+        firebase_admin.get_app()
+    except ValueError:
+        firebase_admin.initialize_app(credentials.Certificate(service_account))
+    return firestore.client()
+
+
+def id_partitions(n: int) -> List[Tuple[Optional[str], Optional[str]]]:
+    """Split the document-id space into `n` contiguous [start, end) ranges by leading character.
+
+    Balanced for auto-generated ids; custom ids are still covered exactly once
+    (the first range is open below and the last open above).
+    """
+    n = max(1, min(int(n), len(ID_ALPHABET)))
+    bounds = [ID_ALPHABET[round(i * len(ID_ALPHABET) / n)] for i in range(1, n)]
+    edges = [None] + bounds + [None]
+    return [(edges[i], edges[i + 1]) for i in range(n)]
+
+
+def iter_pages(db, collection: str, page_size: int = 500, fields: Optional[Iterable[str]] = None,
+               start: Optional[str] = None, end: Optional[str] = None,
+               after: Optional[str] = None) -> Iterator[List]:
+    """Yield pages (lists of snapshots) of `collection` ordered by document id.
+
+    `start`/`end` bound the id range ([start, end)); `after` resumes after a
+    document id from a checkpoint. `fields` projects the returned data
+    (an empty list returns ids only).
+    """
+    base = db.collection(collection).order_by('__name__')
+    if fields is not None:
+        base = base.select(list(fields))
+    if end is not None:
+        base = base.end_before({'__name__': end})
+    cursor = after
+    while True:
+        q = base
+        if cursor is not None:
+            q = q.start_after({'__name__': cursor})
+        elif start is not None:
+            q = q.start_at({'__name__': start})
+        page = list(q.limit(page_size).stream())
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        cursor = page[-1].id
+
+
+def iter_query_pages(query, order_fields: List[str], page_size: int = 500) -> Iterator[List]:
+    """Yield pages of an arbitrary query, continuing with a cursor on `order_fields`.
+
+    The query must already be ordered by `order_fields`, ending with
+    '__name__' so the cursor is unique.
+    """
+    cursor = None
+    while True:
+        q = query if cursor is None else query.start_after(cursor)
+        page = list(q.limit(page_size).stream())
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        last = page[-1]
+        cursor = {f: (last.id if f == '__name__' else last.get(f)) for f in order_fields}
+
+
+def server_count(db, collection: str) -> Optional[int]:
+    """Document count via a server-side aggregation query (None if unsupported)."""
+    try:
+        res = db.collection(collection).count().get()
+        return int(res[0][0].value)
+    except Exception:
+        return None
+
+
+class Progress:
+    """Thread-safe counters with a periodic one-line throughput report."""
+
+    def __init__(self, interval: float = 5.0, label: str = 'docs'):
+        self.interval = interval
+        self.label = label
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + n
+
+    def get(self, key: str) -> int:
+        return self.counts.get(key, 0)
+
+    def rate(self, key: str) -> float:
+        elapsed = max(1e-9, time.monotonic() - self.started)
+        return self.get(key) / elapsed
+
+    def line(self) -> str:
+        elapsed = time.monotonic() - self.started
+        parts = [f'{k}={v}' for k, v in sorted(self.counts.items())]
+        return f'[{elapsed:7.1f}s] ' + ' '.join(parts) + f'  ({self.rate(self.label):.0f} {self.label}/s)'
+
+    def start(self) -> 'Progress':
+        if self.interval > 0:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            print(self.line(), flush=True)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+class Checkpoint:
+    """Per-task resume state (last processed id, done flag, counters) persisted as JSON.
+
+    Written atomically after every page, so an interrupted run resumes where it
+    stopped with --resume.
+    """
+
+    def __init__(self, path: Optional[str], resume: bool = False):
+        self.path = Path(path) if path else None
+        self._lock = threading.Lock()
+        self.state: Dict[str, Dict] = {}
+        if self.path is not None and resume and self.path.exists():
+            self.state = json.loads(self.path.read_text(encoding='utf-8')).get('tasks', {})
+
+    def get(self, task: str) -> Dict:
+        return dict(self.state.get(task) or {})
+
+    def update(self, task: str, **values) -> None:
+        with self._lock:
+            self.state.setdefault(task, {}).update(values)
+            if self.path is None:
+                return
+            tmp = self.path.with_suffix(self.path.suffix + '.tmp')
+            tmp.write_text(json.dumps({'tasks': self.state}, indent=1, default=str), encoding='utf-8')
+            os.replace(str(tmp), str(self.path))
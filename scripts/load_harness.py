@@ -0,0 +1,380 @@
+"""Replay portal traffic mixes against a running API server and find its saturation point.
+
+Standard library only (asyncio + raw HTTP/1.1 keep-alive connections), so it
+can run from any box that can reach the server. Each virtual user is a closed
+loop: pick a request from the profile by weight, send it, wait for the full
+response, optionally think, repeat. Concurrency is ramped through stages; for
+each stage the harness records per-endpoint latency percentiles, error rates
+and throughput, and reports the last stage before throughput stops scaling
+(the saturation point for the server's current worker count).
+
+Built-in profiles mirror what the pages call:
+ - student / counselor / parent: dashboard page load, chatbot context seeding
+   (`/model_info`, `/predictions_saved`) and `/chat` (streamed, as chatbot.js does)
+ - admin: user-management and settings pages (`/health`, `/model_info`,
+   `/predictions_saved`, `/admin/chat_key_status`, batch and single-row
+   `/predict`, occasional `/train`)
+ - mixed: production-like blend of the above
+
+`/train` overwrites the model on the target server, so it is only sent with
+--allow-train. Point the server at scripts/stub_provider.py (GEMINI_API_BASE)
+before load-testing `/chat`.
+
+Usage (PowerShell):
+    python .\\scripts\\load_harness.py --base http://127.0.0.1:8000 --profile mixed --ramp 1,2,4,8,16,32 --stage-seconds 20
+    python .\\scripts\\load_harness.py --profile admin --batch-rows 200 --allow-train --output load.json
+    python .\\scripts\\load_harness.py --profile-file my_profile.json --profile nightly
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from urllib.parse import urlsplit
+
+CHAT_QUESTIONS = (
+    'Which students are at high risk this week?',
+    'How can I help a student with high stress and low attendance?',
+    'Summarize the latest predictions for my class.',
+    'What does a CGPA below 5 mean for dropout risk?',
+    'Suggest a counseling plan for a student with falling attendance.',
+)
+
+# weight, name, method, path, body kind (None | 'row' | 'batch' | 'train' | 'chat')
+PROFILES = {
+    'student': [
+        (10, 'GET page', 'GET', '/student/dashboard.html', None),
+        (10, 'GET /model_info', 'GET', '/model_info', None),
+        (10, 'GET /predictions_saved', 'GET', '/predictions_saved', None),
+        (6, 'POST /chat', 'POST', '/chat', 'chat'),
+    ],
+    'counselor': [
+        (8, 'GET page', 'GET', '/counselor/dashboard.html', None),
+        (10, 'GET /model_info', 'GET', '/model_info', None),
+        (10, 'GET /predictions_saved', 'GET', '/predictions_saved', None),
+        (8, 'POST /chat', 'POST', '/chat', 'chat'),
+    ],
+    'parent': [
+        (10, 'GET page', 'GET', '/parent/dashboard.html', None),
+        (10, 'GET /model_info', 'GET', '/model_info', None),
+        (10, 'GET /predictions_saved', 'GET', '/predictions_saved', None),
+        (4, 'POST /chat', 'POST', '/chat', 'chat'),
+    ],
+    'admin': [
+        (6, 'GET page', 'GET', '/admin/user-management.html', None),
+        (12, 'GET /health', 'GET', '/health', None),
+        (8, 'GET /model_info', 'GET', '/model_info', None),
+        (8, 'GET /predictions_saved', 'GET', '/predictions_saved', None),
+        (2, 'GET /admin/chat_key_status', 'GET', '/admin/chat_key_status', None),
+        (10, 'POST /predict (row)', 'POST', '/predict', 'row'),
+        (6, 'POST /predict (batch)', 'POST', '/predict', 'batch'),
+        (1, 'POST /train', 'POST', '/train', 'train'),
+    ],
+    'mixed': [
+        (30, 'POST /predict (row)', 'POST', '/predict', 'row'),
+        (8, 'POST /predict (batch)', 'POST', '/predict', 'batch'),
+        (1, 'POST /train', 'POST', '/train', 'train'),
+        (25, 'GET /predictions_saved', 'GET', '/predictions_saved', None),
+        (12, 'GET /model_info', 'GET', '/model_info', None),
+        (8, 'GET /health', 'GET', '/health', None),
+        (6, 'GET page', 'GET', '/counselor/dashboard.html', None),
+        (10, 'POST /chat', 'POST', '/chat', 'chat'),
+    ],
+}
+
+# Non-2xx answers the pages treat as normal (404 until any prediction has been saved).
+EXPECTED_STATUS = {'/predictions_saved': (404,)}
+
+
+def percentile(sorted_vals, q):
+    if not sorted_vals:
+        return None
+    k = (len(sorted_vals) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_vals) - 1)
+    return sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * (k - lo)
+
+
+def student_row(rnd, i):
+    # same shape the admin page sends (admin/user-management.html)
+    return {'id': f's{i}', 'attendance': round(rnd.uniform(40, 100), 1), 'cgpa': round(rnd.uniform(3, 10), 2),
+            'stress': round(rnd.uniform(0, 10), 1)}
+
+
+def build_body(kind, rnd, opts, seq):
+    if kind == 'row':
+        return student_row(rnd, seq)
+    if kind == 'batch':
+        return [student_row(rnd, i) for i in range(opts.batch_rows)]
+    if kind == 'train':
+        examples = []
+        for i in range(opts.train_rows):
+            r = student_row(rnd, i)
+            r['label'] = 1 if (r['attendance'] < 65 or r['cgpa'] < 5 or r['stress'] > 7) else 0
+            examples.append(r)
+        return {'examples': examples}
+    if kind == 'chat':
+        q = rnd.choice(CHAT_QUESTIONS)
+        if opts.unique_chat:
+            q = f'{q} (#{seq})'  # defeat the reply cache so every request reaches the provider
+        return {'messages': [{'role': 'system', 'content': 'EduCare assistant'}, {'role': 'user', 'content': q}],
+                'stream': True, 'raw': False}
+    return None
+
+
+class Connection:
+    """Minimal HTTP/1.1 keep-alive client connection (Content-Length and chunked bodies)."""
+
+    def __init__(self, host, port, timeout):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            try:
+                self.writer.close()
+            except Exception:
+                pass
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None, headers=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), self.timeout)
+        data = b'' if body is None else json.dumps(body).encode('utf-8')
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}', 'Connection: keep-alive',
+                 'Accept-Encoding: identity']
+        if body is not None:
+            lines += ['Content-Type: application/json', f'Content-Length: {len(data)}']
+        for k, v in (headers or {}).items():
+            lines.append(f'{k}: {v}')
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + data)
+        await self.writer.drain()
+        return await asyncio.wait_for(self._read_response(), self.timeout)
+
+    async def _read_response(self):
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError('connection closed by server')
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            k, _, v = line.decode('latin-1').partition(':')
+            headers[k.strip().lower()] = v.strip()
+        size = 0
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                n = int((await self.reader.readline()).split(b';')[0], 16)
+                if n == 0:
+                    await self.reader.readline()
+                    break
+                size += len(await self.reader.readexactly(n + 2)) - 2
+        elif 'content-length' in headers:
+            n = int(headers['content-length'])
+            size = len(await self.reader.readexactly(n)) if n else 0
+        else:
+            size = len(await self.reader.read())
+            headers['connection'] = 'close'
+        if headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, size
+
+
+class StageStats:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.status = {}
+
+    def record(self, name, seconds, status, error):
+        self.latencies.setdefault(name, []).append(seconds)
+        if error:
+            self.errors[name] = self.errors.get(name, 0) + 1
+        key = f'{name} {status}'
+        self.status[key] = self.status.get(key, 0) + 1
+
+    def summary(self, duration):
+        endpoints = {}
+        total = 0
+        total_err = 0
+        all_lat = []
+        for name, lat in sorted(self.latencies.items()):
+            s = sorted(lat)
+            err = self.errors.get(name, 0)
+            total += len(s)
+            total_err += err
+            all_lat.extend(s)
+            endpoints[name] = {
+                'requests': len(s),
+                'errors': err,
+                'error_rate': round(err / len(s), 4),
+                'rps': round(len(s) / duration, 2),
+                'p50_ms': round(percentile(s, 0.50) * 1000.0, 2),
+                'p95_ms': round(percentile(s, 0.95) * 1000.0, 2),
+                'p99_ms': round(percentile(s, 0.99) * 1000.0, 2),
+                'max_ms': round(s[-1] * 1000.0, 2),
+            }
+        all_lat.sort()
+        return {
+            'requests': total,
+            'errors': total_err,
+            'error_rate': round(total_err / total, 4) if total else 0.0,
+            'rps': round(total / duration, 2),
+            'ok_rps': round((total - total_err) / duration, 2),
+            'p50_ms': round(percentile(all_lat, 0.50) * 1000.0, 2) if all_lat else None,
+            'p95_ms': round(percentile(all_lat, 0.95) * 1000.0, 2) if all_lat else None,
+            'p99_ms': round(percentile(all_lat, 0.99) * 1000.0, 2) if all_lat else None,
+            'endpoints': endpoints,
+            'status_counts': dict(sorted(self.status.items())),
+        }
+
+
+async def virtual_user(uid, opts, profile, stats, stop_at, host, port, headers):
+    rnd = random.Random(opts.seed * 1000003 + uid)
+    weights = [p[0] for p in profile]
+    conn = Connection(host, port, opts.timeout)
+    seq = uid * 1000000
+    try:
+        while time.monotonic() < stop_at:
+            _, name, method, path, kind = rnd.choices(profile, weights=weights)[0]
+            seq += 1
+            body = build_body(kind, rnd, opts, seq)
+            t0 = time.perf_counter()
+            status, error = 0, True
+            try:
+                status, _ = await conn.request(method, path, body, headers)
+                error = status >= 400 and status not in EXPECTED_STATUS.get(path, ())
+            except Exception:
+                await conn.close()
+            stats.record(name, time.perf_counter() - t0, status, error)
+            if opts.think:
+                await asyncio.sleep(rnd.expovariate(1.0 / opts.think))
+    finally:
+        await conn.close()
+
+
+async def run_stage(concurrency, opts, profile, host, port, headers):
+    stats = StageStats()
+    started = time.monotonic()
+    stop_at = started + opts.stage_seconds
+    await asyncio.gather(*(virtual_user(i, opts, profile, stats, stop_at, host, port, headers)
+                           for i in range(concurrency)))
+    return stats.summary(max(1e-6, time.monotonic() - started))
+
+
+def find_saturation(stages, min_gain, max_error_rate):
+    """Return (best, saturated): indexes of the last stage that still scaled and of the first that did not.
+
+    A stage counts as scaling when its successful throughput improved by at
+    least `min_gain` over the best earlier stage and its error rate is within
+    `max_error_rate`. The first stage that fails either test marks saturation;
+    `saturated` is None when throughput kept scaling through the whole ramp.
+    """
+    best_idx = None
+    for i, st in enumerate(stages):
+        if st['error_rate'] > max_error_rate:
+            return best_idx, i
+        if best_idx is None or st['ok_rps'] >= stages[best_idx]['ok_rps'] * (1.0 + min_gain):
+            best_idx = i
+            continue
+        return best_idx, i
+    return best_idx, None
+
+
+def load_profiles(path):
+    """Custom profiles: {"name": [{"weight": 5, "name": "...", "method": "GET", "path": "/x", "body": "row"}, ...]}."""
+    with open(path, 'r', encoding='utf-8') as fh:
+        data = json.load(fh)
+    out = {}
+    for pname, items in data.items():
+        out[pname] = [(float(it.get('weight', 1)), it.get('name') or f"{it.get('method', 'GET')} {it['path']}",
+                       it.get('method', 'GET').upper(), it['path'], it.get('body')) for it in items]
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--base', default='http://127.0.0.1:8000', help='Server base URL')
+    parser.add_argument('--profile', default='mixed', help=f'Traffic profile ({", ".join(PROFILES)})')
+    parser.add_argument('--profile-file', default='', help='JSON file with additional profiles')
+    parser.add_argument('--ramp', default='1,2,4,8,16,32', help='Comma-separated concurrency stages')
+    parser.add_argument('--stage-seconds', type=float, default=15.0)
+    parser.add_argument('--think', type=float, default=0.0, help='Mean think time between requests (s)')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout (s)')
+    parser.add_argument('--batch-rows', type=int, default=100, help='Rows per admin batch /predict')
+    parser.add_argument('--train-rows', type=int, default=200, help='Examples per /train request')
+    parser.add_argument('--allow-train', action='store_true', help='Send /train (overwrites the server model)')
+    parser.add_argument('--no-unique-chat', dest='unique_chat', action='store_false',
+                        help='Repeat identical chat prompts (lets the reply cache answer)')
+    parser.add_argument('--min-gain', type=float, default=0.10, help='Throughput gain a stage needs to count as scaling')
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--header', action='append', default=[], help='Extra header "Name: value" (repeatable)')
+    parser.add_argument('--output', default='', help='Write the full report as JSON')
+    opts = parser.parse_args()
+
+    profiles = dict(PROFILES)
+    if opts.profile_file:
+        profiles.update(load_profiles(opts.profile_file))
+    if opts.profile not in profiles:
+        print(f'Unknown profile {opts.profile!r}; choose from {", ".join(profiles)}')
+        sys.exit(2)
+    profile = [p for p in profiles[opts.profile] if opts.allow_train or p[4] != 'train']
+    if len(profile) != len(profiles[opts.profile]):
+        print('Note: /train excluded from the profile (pass --allow-train to include it)')
+
+    u = urlsplit(opts.base)
+    host, port = u.hostname or '127.0.0.1', u.port or (443 if u.scheme == 'https' else 80)
+    if u.scheme == 'https':
+        print('https is not supported; point --base at the API directly (http)')
+        sys.exit(2)
+    headers = {}
+    for h in opts.header:
+        k, _, v = h.partition(':')
+        headers[k.strip()] = v.strip()
+
+    ramp = [int(x) for x in opts.ramp.split(',') if x]
+    stages = []
+    print(f'Profile {opts.profile} against {opts.base}: ' +
+          ', '.join(f'{name} ({w:g})' for w, name, _, _, _ in profile))
+    for c in ramp:
+        res = asyncio.run(run_stage(c, opts, profile, host, port, headers))
+        res['concurrency'] = c
+        stages.append(res)
+        print(f"\nconcurrency {c:>4}: {res['rps']:>8.1f} req/s ({res['ok_rps']:.1f} ok)  err {res['error_rate']:.2%}  "
+              f"p50 {res['p50_ms']} ms  p95 {res['p95_ms']} ms  p99 {res['p99_ms']} ms")
+        for name, e in res['endpoints'].items():
+            print(f"    {name:<28} {e['requests']:>7} req  {e['rps']:>8.1f}/s  err {e['error_rate']:>6.2%}  "
+                  f"p50 {e['p50_ms']:>9} ms  p95 {e['p95_ms']:>9} ms  p99 {e['p99_ms']:>9} ms")
+
+    best, sat = find_saturation(stages, opts.min_gain, opts.max_error_rate)
+    report = {'profile': opts.profile, 'base': opts.base, 'ramp': ramp, 'stage_seconds': opts.stage_seconds,
+              'stages': stages, 'saturation': None}
+    if best is not None:
+        report['saturation'] = {
+            'best_concurrency': stages[best]['concurrency'],
+            'best_ok_rps': stages[best]['ok_rps'],
+            'saturated_at': stages[sat]['concurrency'] if sat is not None else None,
+        }
+        if sat is None:
+            print(f"\nThroughput still scaling at concurrency {stages[best]['concurrency']} "
+                  f"({stages[best]['ok_rps']} ok req/s); extend --ramp to find the saturation point.")
+        else:
+            print(f"\nSaturation: throughput peaks around concurrency {stages[best]['concurrency']} "
+                  f"({stages[best]['ok_rps']} ok req/s); concurrency {stages[sat]['concurrency']} adds no throughput "
+                  f"or exceeds the error budget.")
+    if opts.output:
+        with open(opts.output, 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, indent=2)
+        print(f'Wrote {opts.output}')
+
+
+if __name__ == '__main__':
+    main()
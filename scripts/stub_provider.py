@@ -0,0 +1,147 @@
+"""Local stub of the Generative Language API for exercising /chat without a real key.
+
+It answers the three request shapes the server's provider client uses
+(`?key=` query parameter, `Authorization: Bearer`, and v1 `models:generate`)
+with a canned reply, after an optional artificial latency. The
+`streamGenerateContent?alt=sse` endpoint streams the same reply in chunks with
+--chunk-delay between them, so time-to-first-token can be measured.
+
+Usage (PowerShell):
+    python .\\scripts\\stub_provider.py --port 8765 --latency 0.2
+    $env:GEMINI_API_BASE = 'http://127.0.0.1:8765'; $env:GEMINI_API_KEY = 'stub'
+    python .\\model\\server_no_reload.py
+
+Use --accept to only accept some variants (e.g. --accept v1_models_generate) to
+check that the server falls back and then remembers the working variant.
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+ALL_VARIANTS = ('query_key', 'auth_header', 'v1_models_generate', 'stream_sse')
+
+
+def make_handler(opts):
+    counts = {v: 0 for v in ALL_VARIANTS}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive, so connection reuse is observable
+
+        def log_message(self, fmt, *args):
+            if not opts.quiet:
+                sys.stderr.write('stub: ' + (fmt % args) + '\n')
+
+        def _send_json(self, status, obj):
+            body = json.dumps(obj).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/stats':
+                with lock:
+                    return self._send_json(200, {'requests': dict(counts)})
+            self._send_json(404, {'error': 'not found'})
+
+        def do_POST(self):
+            parts = urlsplit(self.path)
+            length = int(self.headers.get('Content-Length') or 0)
+            raw = self.rfile.read(length) if length else b''
+            try:
+                body = json.loads(raw or b'{}')
+            except Exception:
+                return self._send_json(400, {'error': 'invalid json'})
+
+            if parts.path.endswith(':streamGenerateContent'):
+                variant = 'stream_sse'
+            elif parts.path == '/v1/models:generate':
+                variant = 'v1_models_generate'
+            elif 'key' in parse_qs(parts.query):
+                variant = 'query_key'
+            elif (self.headers.get('Authorization') or '').startswith('Bearer '):
+                variant = 'auth_header'
+            else:
+                return self._send_json(401, {'error': 'missing credentials'})
+            with lock:
+                counts[variant] += 1
+
+            if opts.latency:
+                time.sleep(opts.latency)
+            if variant not in opts.accept:
+                return self._send_json(404, {'error': f'variant {variant} not supported by stub'})
+            if opts.fail_rate and random.random() < opts.fail_rate:
+                return self._send_json(503, {'error': 'stub induced failure'})
+
+            if variant == 'stream_sse':
+                prompt = ''.join(p.get('text', '') for c in body.get('contents') or [] for p in c.get('parts') or [])
+            else:
+                prompt = ((body.get('prompt') or {}).get('text') or '')
+            reply = opts.reply or f'Stub reply ({variant}) to a {len(prompt)}-character prompt.'
+            if variant != 'stream_sse':
+                return self._send_json(200, {'candidates': [{'output': reply}]})
+
+            # stream the reply word by word as Gemini-style SSE events, using
+            # chunked transfer encoding like the real endpoint
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            words = reply.split(' ')
+            step = max(1, len(words) // max(1, opts.chunks))
+            for i in range(0, len(words), step):
+                text = ' '.join(words[i:i + step]) + (' ' if i + step < len(words) else '')
+                event = {'candidates': [{'content': {'parts': [{'text': text}]}}]}
+                data = b'data: ' + json.dumps(event).encode('utf-8') + b'\n\n'
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+                self.wfile.flush()
+                if opts.chunk_delay:
+                    time.sleep(opts.chunk_delay)
+            self.wfile.write(b'0\r\n\r\n')
+
+    return Handler
+
+
+def serve(port=8765, host='127.0.0.1', latency=0.0, accept=ALL_VARIANTS, fail_rate=0.0, reply='', quiet=True,
+          chunks=8, chunk_delay=0.0):
+    """Start the stub in a background thread and return the server (call .shutdown() to stop)."""
+    opts = argparse.Namespace(latency=latency, accept=tuple(accept), fail_rate=fail_rate, reply=reply, quiet=quiet,
+                              chunks=chunks, chunk_delay=chunk_delay)
+    httpd = ThreadingHTTPServer((host, port), make_handler(opts))
+    httpd.daemon_threads = True
+    t = threading.Thread(target=httpd.serve_forever, daemon=True)
+    t.start()
+    return httpd
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds to wait before answering each request')
+    parser.add_argument('--accept', default=','.join(ALL_VARIANTS), help='Comma-separated request variants to accept')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Fraction of accepted requests answered with 503')
+    parser.add_argument('--reply', default='', help='Fixed reply text (default echoes the prompt size)')
+    parser.add_argument('--chunks', type=int, default=8, help='Number of SSE chunks a streamed reply is split into')
+    parser.add_argument('--chunk-delay', type=float, default=0.0, help='Seconds between streamed chunks')
+    parser.add_argument('--quiet', action='store_true')
+    args = parser.parse_args()
+    args.accept = tuple(v.strip() for v in args.accept.split(',') if v.strip())
+
+    httpd = ThreadingHTTPServer((args.host, args.port), make_handler(args))
+    print(f'Stub provider listening on http://{args.host}:{args.port} (accept={",".join(args.accept)})')
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()